@@ -0,0 +1,179 @@
+"""
+ * The <code>ArrivalRateTest</code> is a test decorator that runs
+ * a test at a constant arrival rate for a specified duration.
+ * <p>
+ * Unlike a <code>LoadTest</code>, in which each user waits for its
+ * previous iteration to complete before starting the next one, an
+ * <code>ArrivalRateTest</code> is an open model: requests are
+ * scheduled at fixed intended start times, whether or not earlier
+ * requests have completed, and are run by a set of worker threads.
+ * When the decorated test slows down, requests queue up behind the
+ * busy workers instead of being issued later.
+ * </p>
+ * <p>
+ * The latency of each request is measured from its intended start
+ * time rather than from the time a worker picked it up, so queueing
+ * delay is included and the measurements are not subject to
+ * coordinated omission.  The service time, excluding the queueing
+ * delay, is recorded separately.
+ * </p>
+ * <p>
+ * For example, to run <code>ExampleTest.testSomething()</code> 200 times
+ * per second for 30 seconds with up to 50 requests in progress, and to
+ * require a 99th percentile latency of 0.25 seconds, use:
+ * <blockquote>
+ * <pre>
+ * arrivalRateTest = ArrivalRateTest(ExampleTest("testSomething"), 200, 30, 50)
+ * timedTest = TimedTest(arrivalRateTest, 31, percentileLimits={99: 0.25})
+ * </pre>
+ * </blockquote>
+ * </p>
+"""
+
+import time
+from queue import Queue
+
+from CustomExceptions import IllegalArgumentException
+from Histogram import Histogram
+from Sample import Sample, SampleResult, getCurrentUserId, publishSample
+from Test import Test
+from ThreadedTestGroup import ThreadedTestGroup
+from ThreadInGroup import ThreadInGroup
+from VirtualUser import VirtualUser
+
+
+class ArrivalRateTest(Test):
+
+    def __init__(self, test, rate, duration, users=10):
+        """
+         * Constructs an <code>ArrivalRateTest</code> to decorate
+         * the specified test.
+         *
+         * @param test Test to decorate.
+         * @param rate Number of requests started per second.
+         * @param duration Duration of the test (in seconds).
+         * @param users Number of worker threads, that is, the
+         *        maximum number of requests in progress.
+        """
+        if rate <= 0:
+            raise IllegalArgumentException("Arrival rate must be > 0")
+        if duration <= 0:
+            raise IllegalArgumentException("Duration must be > 0")
+        if users < 1:
+            raise IllegalArgumentException("Number of users must be > 0")
+        if test is None:
+            raise IllegalArgumentException("Decorated test is null")
+
+        self.test = test
+        self.rate = rate
+        self.duration = duration
+        self.users = users
+        self.requests = int(rate * duration)
+        self.group = ThreadedTestGroup(self, "ArrivalRateTest:ThreadedTestGroup")
+        self.sampleListeners = []
+        self.latencyHistogram = Histogram()
+        self.serviceTimeHistogram = Histogram()
+        self.elapsedTime = None
+
+    def countTestCases(self):
+        """
+         * Returns the number of tests in this arrival rate test.
+         *
+         * @return Number of tests.
+        """
+        return self.requests * self.test.countTestCases()
+
+    def addSampleListener(self, listener):
+        """
+         * Registers a sample listener.  Each request is recorded
+         * as a sample whose elapsed time is measured from the
+         * intended start time of the request.
+        """
+        self.sampleListeners.append(listener)
+        return True
+
+    def run(self, result):
+        """
+         * Runs the test.
+         *
+         * @param result Test result.
+        """
+        self.group.setTestResult(result)
+        self.latencyHistogram.reset()
+        self.serviceTimeHistogram.reset()
+        queue = Queue()
+        for i in range(self.users):
+            ThreadInGroup(self.group, Worker(self, result, queue, VirtualUser(i))).start()
+
+        startTime = time.perf_counter()
+        self.wallClockOffset = time.time() - startTime
+        for i in range(self.requests):
+            intendedStartTime = startTime + i / self.rate
+            delay = intendedStartTime - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            queue.put(intendedStartTime)
+        for i in range(self.users):
+            queue.put(None)
+
+        self.group.waitForAllThreads()
+        self.elapsedTime = time.perf_counter() - startTime
+
+    def __call__(self, result):
+        self.run(result)
+
+    def recordRequest(self, intendedStartTime, startTime, endTime, sampleResult):
+        latency = endTime - intendedStartTime
+        self.latencyHistogram.recordValue(latency)
+        self.serviceTimeHistogram.recordValue(endTime - startTime)
+        publishSample(self.sampleListeners,
+                      Sample(intendedStartTime + self.wallClockOffset, latency, getCurrentUserId(),
+                             sampleResult.outcome, sampleResult.errorType))
+
+    def getLatencyHistogram(self):
+        """
+         * Returns the histogram of request latencies, measured
+         * from the intended start times, recorded during the last run.
+        """
+        return self.latencyHistogram
+
+    def getServiceTimeHistogram(self):
+        """
+         * Returns the histogram of request service times, excluding
+         * queueing delay, recorded during the last run.
+        """
+        return self.serviceTimeHistogram
+
+    def getAchievedRate(self):
+        """
+         * Returns the number of requests completed per second
+         * during the last run.
+        """
+        if not self.elapsedTime:
+            return None
+        return self.requests / self.elapsedTime
+
+    def __str__(self):
+        return ("ArrivalRateTest (" + str(self.rate) + "/sec. for " +
+                str(self.duration) + " sec.): " + str(self.test))
+
+
+class Worker:
+
+    def __init__(self, arrivalRateTest, result, queue, user):
+        self.arrivalRateTest = arrivalRateTest
+        self.result = result
+        self.queue = queue
+        self.user = user
+
+    def __call__(self):
+        with self.user:
+            while True:
+                intendedStartTime = self.queue.get()
+                if intendedStartTime is None:
+                    return
+                sampleResult = SampleResult(self.result)
+                startTime = time.perf_counter()
+                self.arrivalRateTest.test.run(sampleResult)
+                self.arrivalRateTest.recordRequest(intendedStartTime, startTime, time.perf_counter(),
+                                                   sampleResult)
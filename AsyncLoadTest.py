@@ -0,0 +1,178 @@
+"""
+ * The <code>AsyncLoadTest</code> is a test decorator that runs
+ * a coroutine-based test with a simulated number of concurrent
+ * users and iterations.
+ * <p>
+ * It is the asyncio counterpart of <code>LoadTest</code>.  Instead
+ * of starting a thread per user, each user is a task on a single
+ * event loop, which allows tens of thousands of concurrent users
+ * to be simulated from one process.  The decorated test is a
+ * <code>TestCase</code> whose test method, and optionally
+ * <code>setUp()</code> and <code>tearDown()</code>, are
+ * <code>async def</code> coroutines, or a
+ * <code>TestCaseWithParameters</code> decorating a coroutine function.
+ * </p>
+ * <p>
+ * For example, to create a load test of 10,000 concurrent users
+ * with each user awaiting <code>ExampleTest.testSomething()</code>
+ * 5 times, with a one millisecond delay between the addition of
+ * users, and with a maximum elapsed time of 10 seconds, use:
+ * <blockquote>
+ * <pre>
+ * timer = ConstantTimer(1)
+ * loadTest = AsyncLoadTest(ExampleTest("testSomething"), 10000, 5, timer)
+ * timedTest = TimedTest(loadTest, 10)
+ * </pre>
+ * </blockquote>
+ * </p>
+"""
+
+import asyncio
+import inspect
+import sys
+import time
+from unittest import SkipTest
+
+from Cancellation import Cancellation
+from ConstantTimer import ConstantTimer
+from CustomExceptions import IllegalArgumentException
+from Sample import Sample, SampleResult, publishSample
+from Test import Test
+from VirtualUser import VirtualUser
+
+
+class AsyncLoadTest(Test):
+
+    def __init__(self, test, users, iterations=0, timer=None):
+        """
+         * Constructs an <code>AsyncLoadTest</code> to decorate
+         * the specified test using the specified number
+         * of concurrent users starting simultaneously and
+         * the number of iterations per user. If a Timer is
+         * indicated, then a delay is introduced
+         *
+         * @param test Test to decorate.
+         * @param users Number of concurrent users.
+         * @param iterations Number of iterations per user.
+         * @param timer Delay timer.
+        """
+        if timer is None:
+            timer = ConstantTimer(0)
+        if users < 1:
+            raise IllegalArgumentException("Number of users must be > 0")
+        if test is None:
+            raise IllegalArgumentException("Decorated test is null")
+
+        self.test = test
+        self.users = users
+        self.iterations = max(iterations, 1)
+        self.timer = timer
+        self.sampleListeners = []
+
+    def countTestCases(self):
+        """
+         * Returns the number of tests in this load test.
+         *
+         * @return Number of tests.
+        """
+        return self.users * self.iterations * self.test.countTestCases()
+
+    def addSampleListener(self, listener):
+        """
+         * Registers a sample listener.  Each iteration of each
+         * user is recorded as a sample.
+        """
+        self.sampleListeners.append(listener)
+        return True
+
+    def run(self, result):
+        """
+         * Runs the test on a new event loop.
+         *
+         * @param result Test result.
+        """
+        asyncio.run(self.runUsers(result))
+
+    def __call__(self, result):
+        self.run(result)
+
+    async def runUsers(self, result):
+        loop = asyncio.get_running_loop()
+        startTime = loop.time()
+        perfStartTime = time.perf_counter()
+        userStartTime = 0
+        tasks = []
+        for i in range(self.users):
+            userStartTime = self.timer.getStartTime(i, userStartTime)
+            delay = startTime + userStartTime * 0.001 - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            retireTime = self.timer.getRetireTime(i)
+            if retireTime is not None:
+                retireTime = perfStartTime + retireTime * 0.001
+            tasks.append(asyncio.ensure_future(self.runUser(result, VirtualUser(i, retireTime))))
+        await asyncio.gather(*tasks)
+
+    async def runUser(self, result, user):
+        with user:
+            await self.runIterations(result, user)
+
+    async def runIterations(self, result, user):
+        for i in range(self.iterations):
+            if user.isRetired() or Cancellation.isCurrentCancelled():
+                break
+            if not self.sampleListeners:
+                await self.runTest(result)
+                continue
+            sampleResult = SampleResult(result)
+            beginTime = time.time()
+            start = time.perf_counter()
+            await self.runTest(sampleResult)
+            elapsedTime = time.perf_counter() - start
+            publishSample(self.sampleListeners,
+                          Sample(beginTime, elapsedTime, user.userId,
+                                 sampleResult.outcome, sampleResult.errorType))
+
+    async def runTest(self, result):
+        """
+         * Runs the decorated test once, awaiting each of its
+         * fixture and test methods that returns an awaitable,
+         * and reports the outcome to the result.
+         *
+         * @param result Test result.
+        """
+        test = self.test
+        result.startTest(test)
+        try:
+            await self.await_(test.setUp())
+            if hasattr(test, "asyncSetUp"):
+                await self.await_(test.asyncSetUp())
+            try:
+                await self.await_(getattr(test, test._testMethodName)())
+            finally:
+                if hasattr(test, "asyncTearDown"):
+                    await self.await_(test.asyncTearDown())
+                await self.await_(test.tearDown())
+        except SkipTest as e:
+            result.addSkip(test, str(e))
+        except test.failureException:
+            result.addFailure(test, sys.exc_info())
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            raise
+        except BaseException:
+            result.addError(test, sys.exc_info())
+        else:
+            result.addSuccess(test)
+        finally:
+            result.stopTest(test)
+
+    async def await_(self, value):
+        if inspect.isawaitable(value):
+            return await value
+        return value
+
+    def getDelay(self):
+        return self.timer.getDelay()
+
+    def __str__(self):
+        return "AsyncLoadTest: " + str(self.test)
@@ -0,0 +1,107 @@
+"""
+ * A <code>Cancellation</code> lets a test that has run out of
+ * time be cancelled cooperatively.
+ * <p>
+ * A non-waiting <code>TimedTest</code> installs a
+ * <code>Cancellation</code> in the thread running its decorated
+ * test, and the threads that a <code>LoadTest</code> starts on its
+ * behalf inherit it.  When the maximum elapsed time is exceeded,
+ * the cancellation is signalled: <code>RepeatedTest</code> and
+ * <code>LoadTest</code> stop starting new iterations, and a
+ * decorated test can stop its own work by calling:
+ * <blockquote>
+ * <pre>
+ * Cancellation.checkCurrent()
+ * </pre>
+ * </blockquote>
+ * which raises a <code>TestCancelledError</code> once the test
+ * it runs for has been cancelled.
+ * </p>
+"""
+
+from contextvars import ContextVar
+from threading import Lock, get_ident
+
+from CustomExceptions import TestCancelledError
+
+currentCancellation = ContextVar("currentCancellation", default=None)
+
+
+class Cancellation:
+
+    def __init__(self):
+        self.cancelled = False
+        self.callbacks = []
+        self.threads = {}
+        self.lock = Lock()
+
+    def isCancelled(self):
+        return self.cancelled
+
+    def cancel(self):
+        """
+         * Signals the cancellation and runs its callbacks.
+        """
+        with self.lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def addCallback(self, callback):
+        """
+         * Registers a callable to be run when the cancellation is
+         * signalled, or immediately if it has already been signalled.
+        """
+        with self.lock:
+            if not self.cancelled:
+                self.callbacks.append(callback)
+                return
+        callback()
+
+    def getThreadIds(self):
+        """
+         * Returns the identifiers of the threads currently running
+         * on behalf of the cancellable test.
+        """
+        with self.lock:
+            return list(self.threads)
+
+    def __enter__(self):
+        token = currentCancellation.set(self)
+        with self.lock:
+            self.threads.setdefault(get_ident(), []).append(token)
+        return self
+
+    def __exit__(self, *exc_info):
+        ident = get_ident()
+        with self.lock:
+            token = self.threads[ident].pop()
+            if not self.threads[ident]:
+                del self.threads[ident]
+        currentCancellation.reset(token)
+        return False
+
+    @staticmethod
+    def current():
+        """
+         * Returns the <code>Cancellation</code> of the test being
+         * run, or <code>None</code> if it cannot be cancelled.
+        """
+        return currentCancellation.get()
+
+    @staticmethod
+    def isCurrentCancelled():
+        cancellation = currentCancellation.get()
+        return cancellation is not None and cancellation.cancelled
+
+    @staticmethod
+    def checkCurrent():
+        """
+         * Raises a <code>TestCancelledError</code> if the test
+         * being run has been cancelled.
+        """
+        if Cancellation.isCurrentCancelled():
+            raise TestCancelledError("Test cancelled")
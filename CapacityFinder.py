@@ -0,0 +1,192 @@
+"""
+ * The <code>CapacityFinder</code> is a test that searches for the
+ * largest number of concurrent users of a <code>LoadTest</code>
+ * that still meets a service level agreement.
+ * <p>
+ * The agreement is given as a function that decorates a load test
+ * with the tests asserting it, such as a <code>TimedTest</code> with
+ * percentile limits or a <code>ThroughputTest</code>.  The number of
+ * users is doubled until the agreement is not met, then the largest
+ * number that meets it is found by binary search between the last
+ * success and the first failure.  To reject successes due to noise,
+ * a number of users meets the agreement only if the decorated load
+ * test passes every one of several runs.
+ * </p>
+ * <p>
+ * The capacity is reported with its margin: the number of users
+ * between the capacity and the smallest number of users known to
+ * fail, which the search narrows to a fraction of the capacity.
+ * For example, to find how many users keep the 99th percentile
+ * under 0.2 seconds, and fail below 50 users, use:
+ * <blockquote>
+ * <pre>
+ * sla = lambda loadTest: TimedTest(loadTest, 60, percentileLimits={99: 0.2})
+ * capacityFinder = CapacityFinder(ExampleTest("testSomething"), sla,
+ *                                 maxUsers=1000, minCapacity=50,
+ *                                 duration=20, warmUp=5)
+ * </pre>
+ * </blockquote>
+ * </p>
+"""
+
+import sys
+from unittest import TestResult
+
+from CustomExceptions import AssertionFailedError, IllegalArgumentException
+from LoadTest import LoadTest
+from Test import Test
+
+
+class CapacityFinder(Test):
+
+    def __init__(self, test, sla, maxUsers=1024, minCapacity=None, startUsers=1, confirmations=2,
+                 precision=0.05, **loadTestOptions):
+        """
+         * Constructs a <code>CapacityFinder</code>.
+         *
+         * @param test Test decorated by the load tests.
+         * @param sla Callable decorating a <code>LoadTest</code> with
+         *        the tests of the service level agreement.
+         * @param maxUsers Largest number of users tried.
+         * @param minCapacity Capacity below which this test fails,
+         *        or <code>None</code>.
+         * @param startUsers Number of users of the first load test.
+         * @param confirmations Number of additional runs that a
+         *        number of users must pass to meet the agreement.
+         * @param precision Margin, relative to the capacity, at
+         *        which the search stops.
+         * @param loadTestOptions Keyword arguments of the load tests,
+         *        such as <code>iterations</code> or <code>duration</code>.
+        """
+        if startUsers < 1 or maxUsers < startUsers:
+            raise IllegalArgumentException("Users must satisfy 1 <= startUsers <= maxUsers")
+        if confirmations < 0:
+            raise IllegalArgumentException("Number of confirmations must be >= 0")
+        self.test = test
+        self.sla = sla
+        self.maxUsers = maxUsers
+        self.minCapacity = minCapacity
+        self.startUsers = startUsers
+        self.confirmations = confirmations
+        self.precision = precision
+        self.loadTestOptions = loadTestOptions
+        self.isQuiet = False
+        self.trials = []
+        self.capacity = None
+        self.firstFailure = None
+
+    def setQuiet(self):
+        """
+         * Disables the output of the trials and the capacity.
+        """
+        self.isQuiet = True
+
+    def countTestCases(self):
+        return 1
+
+    def run(self, result):
+        result.startTest(self)
+        try:
+            self.search()
+            self.printCapacity()
+            if self.minCapacity is not None and self.capacity < self.minCapacity:
+                result.addFailure(self, (AssertionFailedError,
+                                         AssertionFailedError("Minimum capacity not reached! Expected " +
+                                                              str(self.minCapacity) + " users, but was " +
+                                                              self.getCapacityDescription()), None))
+            else:
+                result.addSuccess(self)
+        except Exception:
+            result.addError(self, sys.exc_info())
+        finally:
+            result.stopTest(self)
+
+    def __call__(self, result):
+        self.run(result)
+
+    def search(self):
+        """
+         * Finds the capacity, by exponential then binary search.
+        """
+        self.trials = []
+        passed, failed = 0, None
+        users = self.startUsers
+        while True:
+            if self.meetsSla(users):
+                passed = users
+                if users == self.maxUsers:
+                    break
+                users = min(users * 2, self.maxUsers)
+            else:
+                failed = users
+                break
+        while failed is not None and failed - passed > max(1, passed * self.precision):
+            users = (passed + failed) // 2
+            if self.meetsSla(users):
+                passed = users
+            else:
+                failed = users
+        self.capacity = passed
+        self.firstFailure = failed
+        return passed
+
+    def meetsSla(self, users):
+        """
+         * Runs the load test with a number of users until it
+         * fails, or has passed every confirmation run.
+        """
+        runs = 0
+        for i in range(1 + self.confirmations):
+            result = TestResult()
+            with LoadTest(self.test, users, **self.loadTestOptions) as loadTest:
+                self.sla(loadTest).run(result)
+            runs += 1
+            if not result.wasSuccessful():
+                self.recordTrial(users, runs, False)
+                return False
+        self.recordTrial(users, runs, True)
+        return True
+
+    def recordTrial(self, users, runs, passed):
+        self.trials.append((users, runs, passed))
+        if not self.isQuiet:
+            sys.stdout.write("%s: %d users %s (%d runs)\n" %
+                             (self, users, "met the SLA" if passed else "failed the SLA", runs))
+            sys.stdout.flush()
+
+    def getTrials(self):
+        """
+         * Returns the <code>(users, runs, passed)</code> of each
+         * number of users tried by the last search.
+        """
+        return self.trials
+
+    def getCapacity(self):
+        """
+         * Returns the capacity found by the last search.
+        """
+        return self.capacity
+
+    def getMargin(self):
+        """
+         * Returns the number of users between the capacity and the
+         * smallest number of users that failed, or <code>None</code>
+         * if even the largest number of users met the agreement.
+        """
+        if self.firstFailure is None:
+            return None
+        return self.firstFailure - self.capacity - 1
+
+    def getCapacityDescription(self):
+        if self.firstFailure is None:
+            return "at least %d users (maximum tried)" % self.capacity
+        return "%d users (+%d, failed at %d users)" % (self.capacity, self.getMargin(),
+                                                      self.firstFailure)
+
+    def printCapacity(self):
+        if not self.isQuiet:
+            sys.stdout.write(str(self) + ": capacity " + self.getCapacityDescription() + "\n")
+            sys.stdout.flush()
+
+    def __str__(self):
+        return "CapacityFinder: " + str(self.test)
@@ -10,5 +10,13 @@ class IllegalArgumentException(Exception):
     
 class AssertionFailedError(Exception):
     pass
+
+class RemoteTestError(Exception):
+    pass
+
+class TestCancelledError(Exception):
+    pass
+    
     
-    
\ No newline at end of file
+class FeedExhaustedError(Exception):
+    pass
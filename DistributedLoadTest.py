@@ -0,0 +1,238 @@
+"""
+ * The <code>DistributedLoadTest</code> is a test decorator that
+ * runs a load test across a number of <code>LoadAgent</code>
+ * processes, so that the load is not limited to what one machine
+ * or one interpreter can generate.
+ * <p>
+ * The users are divided among the agents in contiguous shares.
+ * Each agent runs its share as a <code>LoadTest</code>, with the
+ * same options, and the users start at the times the timer gives
+ * for their indices in the whole load test.  The agents stream
+ * back per-interval histograms of the iteration times, which are
+ * replayed to the sample listeners of the distributed load test,
+ * such as the histogram of an enclosing <code>TimedTest</code>,
+ * and then their failures and errors, which are added to the
+ * local test result.
+ * </p>
+ * <p>
+ * Before the run, the offset between the clock of each agent and
+ * the local clock is estimated from a few request and response
+ * round trips, keeping the one with the shortest round trip, as
+ * NTP does.  The agents are told to start at the same instant
+ * and the interval times they report are corrected, so that the
+ * timelines of all agents line up.
+ * </p>
+ * <p>
+ * For example, to run 200 users on two agents started with
+ * <code>python LoadAgent.py 7777</code> and
+ * <code>python LoadAgent.py 7778</code>, use:
+ * <blockquote>
+ * <pre>
+ * loadTest = DistributedLoadTest(ExampleTest("testSomething"), 200,
+ *                                [("localhost", 7777), ("localhost", 7778)],
+ *                                iterations=10)
+ * timedTest = TimedTest(loadTest, 30, percentileLimits={99: 0.5})
+ * </pre>
+ * </blockquote>
+ * </p>
+"""
+
+import socket
+import threading
+import time
+
+from Cancellation import Cancellation
+from CustomExceptions import IllegalArgumentException, RemoteTestError
+from Histogram import Histogram
+from LoadAgent import receiveFrame, sendFrame
+from Sample import Sample, publishSample
+from Test import Test
+
+TIME_REQUESTS = 8
+
+
+class DistributedLoadTest(Test):
+
+    def __init__(self, test, users, agents, iterations=0, timer=None, duration=None,
+                 warmUp=0, coolDown=0, interval=1.0, startDelay=0.5):
+        """
+         * Constructs a <code>DistributedLoadTest</code>.
+         *
+         * @param test Test to decorate, which must be picklable.
+         * @param users Total number of concurrent users.
+         * @param agents List of <code>(host, port)</code> addresses
+         *        of <code>LoadAgent</code>s.
+         * @param iterations Number of iterations per user.
+         * @param timer Delay timer, applied across all users.
+         * @param duration Duration of the steady-state phase (sec.).
+         * @param warmUp Duration of the warm-up phase (sec.).
+         * @param coolDown Duration of the cool-down phase (sec.).
+         * @param interval Interval (sec.) at which agents report.
+         * @param startDelay Delay (sec.) between sending the load
+         *        test to the agents and starting the users.
+        """
+        if users < 1:
+            raise IllegalArgumentException("Number of users must be > 0")
+        if not agents:
+            raise IllegalArgumentException("At least one agent is required")
+        if len(agents) > users:
+            raise IllegalArgumentException("More agents than users")
+        if iterations and duration:
+            raise IllegalArgumentException("Either iterations or a duration may be given")
+        self.test = test
+        self.users = users
+        self.agents = list(agents)
+        self.iterations = iterations
+        self.options = {"iterations": iterations, "timer": timer, "duration": duration,
+                        "warmUp": warmUp, "coolDown": coolDown}
+        self.interval = interval
+        self.startDelay = startDelay
+        self.sampleListeners = []
+        self.clockOffsets = []
+        self.lock = threading.Lock()
+        self.connections = []
+
+    def countTestCases(self):
+        return self.users * max(1, self.iterations) * self.test.countTestCases()
+
+    def addSampleListener(self, listener):
+        """
+         * Registers a sample listener.  The listener is passed one
+         * sample for each iteration reported by the agents, timed
+         * at the midpoint of its histogram bucket.  A
+         * <code>Histogram</code> listener is merged with the
+         * reported histograms instead.
+        """
+        self.sampleListeners.append(listener)
+        return True
+
+    def getShares(self):
+        """
+         * Returns the list of <code>(firstUser, users)</code>
+         * shares of the agents.
+        """
+        shares = []
+        firstUser = 0
+        for i in range(len(self.agents)):
+            users = self.users // len(self.agents) + (1 if i < self.users % len(self.agents) else 0)
+            shares.append((firstUser, users))
+            firstUser += users
+        return shares
+
+    def getClockOffsets(self):
+        """
+         * Returns the estimated offsets (sec.) of the clocks of
+         * the agents relative to the local clock, as of the last run.
+        """
+        return self.clockOffsets
+
+    def run(self, result):
+        self.connections = [socket.create_connection(address) for address in self.agents]
+        try:
+            for connection in self.connections:
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.clockOffsets = [self.estimateClockOffset(c) for c in self.connections]
+            startAt = time.time() + self.startDelay
+            for connection, offset, (firstUser, users) in zip(self.connections, self.clockOffsets,
+                                                               self.getShares()):
+                sendFrame(connection, ("run", self.test, users, firstUser, self.options,
+                                       startAt + offset, self.interval))
+            cancellation = Cancellation.current()
+            if cancellation is not None:
+                cancellation.addCallback(self.cancelAgents)
+            receivers = []
+            for connection, offset, address in zip(self.connections, self.clockOffsets, self.agents):
+                receiver = threading.Thread(target=self.receiveResults,
+                                            args=(connection, offset, address, result))
+                receiver.daemon = True
+                receiver.start()
+                receivers.append(receiver)
+            for receiver in receivers:
+                receiver.join()
+        finally:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+
+    def __call__(self, result):
+        self.run(result)
+
+    def estimateClockOffset(self, connection):
+        """
+         * Returns the offset of the clock of an agent, estimated
+         * from the time request with the shortest round trip.
+        """
+        bestRoundTrip = None
+        bestOffset = 0.0
+        for i in range(TIME_REQUESTS):
+            sent = time.time()
+            sendFrame(connection, ("time",))
+            agentTime = receiveFrame(connection)[1]
+            received = time.time()
+            roundTrip = received - sent
+            if bestRoundTrip is None or roundTrip < bestRoundTrip:
+                bestRoundTrip = roundTrip
+                bestOffset = agentTime - (sent + received) / 2.0
+        return bestOffset
+
+    def receiveResults(self, connection, offset, address, result):
+        """
+         * Receives the statistics and outcome of an agent until
+         * its share of the load test completes.
+        """
+        while True:
+            try:
+                message = receiveFrame(connection)
+            except OSError:
+                message = None
+            if message is None:
+                with self.lock:
+                    result.addError(self, (RemoteTestError,
+                                           RemoteTestError("Lost connection to agent " +
+                                                           str(address)), None))
+                return
+            if message[0] == "stats":
+                self.publishStatistics(message[1] - offset, message[2])
+            elif message[0] == "done":
+                with self.lock:
+                    message[1].addTo(result, self.getReportedTest())
+                return
+            elif message[0] == "error":
+                with self.lock:
+                    result.addError(self, (RemoteTestError,
+                                           RemoteTestError("Agent " + str(address) + " failed:\n" +
+                                                           message[1]), None))
+                return
+
+    def publishStatistics(self, intervalStart, histograms):
+        """
+         * Passes the histograms of an interval to the sample
+         * listeners.
+         *
+         * @param intervalStart Start time of the interval (local clock).
+         * @param histograms Dictionary mapping outcomes to histograms.
+        """
+        with self.lock:
+            for outcome, histogram in histograms.items():
+                for listener in self.sampleListeners:
+                    if isinstance(listener, Histogram):
+                        listener.add(histogram)
+                        continue
+                    for value, count in histogram.recordedValues():
+                        for i in range(count):
+                            publishSample([listener], Sample(intervalStart, value, None, outcome))
+
+    def cancelAgents(self):
+        for connection in self.connections:
+            try:
+                sendFrame(connection, ("cancel",))
+            except OSError:
+                pass
+
+    def getReportedTest(self):
+        if hasattr(self.test, "failureException"):
+            return self.test
+        return self
+
+    def __str__(self):
+        return ("DistributedLoadTest (" + str(len(self.agents)) + " agents): " + str(self.test))
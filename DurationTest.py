@@ -0,0 +1,119 @@
+"""
+ * A Decorator that runs a test repeatedly until a deadline,
+ * through a warm-up, a steady-state and a cool-down phase.
+ * <p>
+ * A <code>DurationTest</code> is normally created by a
+ * <code>LoadTest</code> constructed with a duration, which
+ * starts the phases of all of its users together:
+ * <blockquote>
+ * <pre>
+ * loadTest = LoadTest(ExampleTest("testSomething"), 50,
+ *                     duration=600, warmUp=60, coolDown=30)
+ * </pre>
+ * </blockquote>
+ * Each sample is tagged with the phase in which it completed.
+ * </p>
+"""
+
+import time
+
+from Cancellation import Cancellation
+from CustomExceptions import IllegalArgumentException
+from Sample import publishSample, runSampled
+from TestDecorator import TestDecorator
+from VirtualUser import VirtualUser
+
+WARM_UP = "warm-up"
+STEADY_STATE = "steady-state"
+COOL_DOWN = "cool-down"
+
+
+class DurationTest(TestDecorator):
+
+    def __init__(self, test, duration, warmUp=0, coolDown=0):
+        """
+         * Constructs a <code>DurationTest</code>.
+         *
+         * @param test Test to decorate.
+         * @param duration Duration of the steady-state phase (sec.).
+         * @param warmUp Duration of the warm-up phase (sec.).
+         * @param coolDown Duration of the cool-down phase (sec.).
+        """
+        TestDecorator.__init__(self, test)
+        if duration <= 0:
+            raise IllegalArgumentException("Duration must be > 0")
+        if warmUp < 0 or coolDown < 0:
+            raise IllegalArgumentException("Warm-up and cool-down must be >= 0")
+        self.duration = duration
+        self.warmUp = warmUp
+        self.coolDown = coolDown
+        self.startTime = None
+        self.sampleListeners = []
+        self.isSampled = TestDecorator.addSampleListener(self, self.onSample)
+
+    def getPhases(self):
+        """
+         * Returns the <code>(name, duration)</code> pairs of the phases.
+        """
+        return [(WARM_UP, self.warmUp), (STEADY_STATE, self.duration), (COOL_DOWN, self.coolDown)]
+
+    def getTotalDuration(self):
+        return self.warmUp + self.duration + self.coolDown
+
+    def begin(self, startTime=None):
+        """
+         * Starts the phases.
+         *
+         * @param startTime Value of <code>time.perf_counter()</code>
+         *        at which the phases start (defaults to now).
+        """
+        if startTime is None:
+            startTime = time.perf_counter()
+        self.startTime = startTime
+
+    def getPhase(self, now=None):
+        """
+         * Returns the name of the current phase, or <code>None</code>
+         * once all phases are over.
+        """
+        if now is None:
+            now = time.perf_counter()
+        elapsedTime = now - self.startTime
+        for name, duration in self.getPhases():
+            if elapsedTime < duration:
+                return name
+            elapsedTime -= duration
+        return None
+
+    def addSampleListener(self, listener):
+        """
+         * Registers a sample listener.  Samples of every phase
+         * are passed to the listener, tagged with their phase.
+        """
+        self.sampleListeners.append(listener)
+        return True
+
+    def onSample(self, sample):
+        sample.phase = self.getPhase() or COOL_DOWN
+        publishSample(self.sampleListeners, sample)
+
+    def countTestCases(self):
+        return TestDecorator.countTestCases(self)
+
+    def run(self, result):
+        if self.startTime is None:
+            self.begin()
+        endTime = self.startTime + self.getTotalDuration()
+        while time.perf_counter() < endTime:
+            if VirtualUser.isCurrentRetired() or Cancellation.isCurrentCancelled():
+                break
+            if self.isSampled or not self.sampleListeners:
+                TestDecorator.run(self, result)
+            else:
+                runSampled(self.test, result, [self.onSample])
+
+    def __call__(self, result):
+        self.run(result)
+
+    def __str__(self):
+        return str(self.test) + "(for " + str(self.getTotalDuration()) + " sec.)"
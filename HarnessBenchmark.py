@@ -0,0 +1,178 @@
+"""
+ * The <code>HarnessBenchmark</code> measures the overhead of
+ * pyunitperf itself, by running a test that does nothing through
+ * its decorators.
+ * <p>
+ * For each number of users, a no-op test is run as a
+ * <code>LoadTest</code>, with a new thread per user and with a
+ * <code>WorkerPool</code>, and the following are measured:
+ * <ul>
+ * <li>the elapsed time of the load test, per user,</li>
+ * <li>the lag between the start of the load test and the start of
+ *     each user's iteration, whose spread is the scheduling jitter,
+ *     and</li>
+ * <li>the time between the completion of the last iteration and the
+ *     return of the load test, spent waiting on its barrier.</li>
+ * </ul>
+ * The cost per iteration of <code>RepeatedTest</code> and of a
+ * <code>TimedTest</code> with its histogram is measured as well,
+ * against calling the no-op test directly.  Each measurement is
+ * repeated, and the median is kept.
+ * </p>
+ * <p>
+ * The results are written as JSON, so that they can be compared
+ * from one version of pyunitperf to the next:
+ * <blockquote>
+ * <pre>
+ * python HarnessBenchmark.py [--users 1,100,1000,10000] [--runs 5] [--output FILE]
+ * </pre>
+ * </blockquote>
+ * </p>
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from statistics import median
+from unittest import TestCase, TestResult
+
+from Histogram import Histogram
+from LoadTest import LoadTest
+from RepeatedTest import RepeatedTest
+from TimedTest import TimedTest
+from WorkerPool import WorkerPool
+
+USERS = (1, 100, 1000, 10000)
+ITERATIONS = 10000
+
+
+class NoOpTest(TestCase):
+
+    def testNoOp(self):
+        pass
+
+
+def measureLoadTest(users, executor):
+    """
+     * Runs a no-op load test once and returns its measurements,
+     * in seconds.
+    """
+    loadTest = LoadTest(NoOpTest("testNoOp"), users, executor=executor)
+    lags = Histogram()
+    completionTimes = []
+    beginTimes = []
+
+    def onSample(sample):
+        beginTimes.append(sample.beginTime)
+        completionTimes.append(sample.beginTime + sample.elapsedTime)
+
+    loadTest.addSampleListener(onSample)
+    result = TestResult()
+    beginTime = time.time()
+    start = time.perf_counter()
+    loadTest.run(result)
+    elapsedTime = time.perf_counter() - start
+    endTime = time.time()
+    for t in beginTimes:
+        lags.recordValue(max(0.0, t - beginTime))
+    return {"elapsedTime": elapsedTime,
+            "elapsedTimePerUser": elapsedTime / users,
+            "startLagP50": lags.getValueAtPercentile(50),
+            "startLagP99": lags.getValueAtPercentile(99),
+            "startLagMax": lags.getMax(),
+            "startSkew": max(beginTimes) - min(beginTimes),
+            "barrierWait": max(0.0, endTime - max(completionTimes)),
+            "errors": len(result.errors) + len(result.failures)}
+
+
+def measureIterations(iterations):
+    """
+     * Returns the time per iteration (sec.) of the no-op test
+     * called directly, repeated, and repeated within a timed test.
+    """
+    test = NoOpTest("testNoOp")
+    result = TestResult()
+    start = time.perf_counter()
+    for i in range(iterations):
+        test.run(result)
+    direct = (time.perf_counter() - start) / iterations
+
+    repeatedTest = RepeatedTest(NoOpTest("testNoOp"), iterations)
+    start = time.perf_counter()
+    repeatedTest.run(TestResult())
+    repeated = (time.perf_counter() - start) / iterations
+
+    timedTest = TimedTest(RepeatedTest(NoOpTest("testNoOp"), iterations), 3600)
+    timedTest.setQuiet()
+    start = time.perf_counter()
+    timedTest.run(TestResult())
+    timed = (time.perf_counter() - start) / iterations
+    return {"direct": direct, "repeated": repeated, "timed": timed,
+            "repeatedOverhead": repeated - direct, "timedOverhead": timed - direct}
+
+
+def summarize(runs):
+    """
+     * Returns the median of each measurement over the runs,
+     * and the total number of errors.
+    """
+    summary = dict((key, median([run[key] for run in runs])) for key in runs[0])
+    if "errors" in summary:
+        summary["errors"] = sum(run["errors"] for run in runs)
+    return summary
+
+
+def runBenchmark(users=USERS, runs=5, iterations=ITERATIONS, out=sys.stderr):
+    """
+     * Runs the benchmark and returns its results as a dictionary.
+    """
+    results = {"python": platform.python_version(),
+               "implementation": platform.python_implementation(),
+               "platform": platform.platform(),
+               "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+               "runs": runs,
+               "unit": "seconds",
+               "loadTests": [],
+               "iterations": None}
+    for n in users:
+        pool = WorkerPool(n, "HarnessBenchmark")
+        try:
+            for name, executor in (("thread", "thread"), ("pool", pool)):
+                out.write("LoadTest of %d users (%s)...\n" % (n, name))
+                out.flush()
+                measurement = summarize([measureLoadTest(n, executor) for i in range(runs)])
+                measurement.update({"users": n, "executor": name})
+                results["loadTests"].append(measurement)
+        finally:
+            pool.shutdown()
+    out.write("Iterations...\n")
+    out.flush()
+    results["iterations"] = summarize([measureIterations(iterations) for i in range(runs)])
+    results["iterations"]["count"] = iterations
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measures the overhead of pyunitperf.")
+    parser.add_argument("--users", default=",".join(str(n) for n in USERS),
+                        help="comma-separated numbers of users")
+    parser.add_argument("--runs", type=int, default=5, help="runs per measurement")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS,
+                        help="iterations of the per-iteration measurements")
+    parser.add_argument("--output", help="file the JSON results are written to (default: stdout)")
+    arguments = parser.parse_args(argv)
+    users = [int(n) for n in arguments.users.split(",") if n]
+    results = runBenchmark(users, arguments.runs, arguments.iterations)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if arguments.output:
+        with open(arguments.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
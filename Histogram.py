@@ -0,0 +1,214 @@
+"""
+ * The <code>Histogram</code> records latency samples into
+ * logarithmically sized buckets, in the manner of an
+ * HDR histogram.
+ * <p>
+ * Each power-of-two range of values is divided into a fixed
+ * number of linear sub-buckets, so that every recorded value
+ * is kept to the requested number of significant decimal
+ * digits, regardless of its magnitude.  Buckets are held
+ * sparsely, which makes histograms cheap to create and
+ * trivially mergeable with <code>add()</code>.
+ * </p>
+ * <p>
+ * Values are given in seconds and stored with nanosecond
+ * resolution.  For example, to record a latency and query
+ * its 99th percentile, use:
+ * <blockquote>
+ * <pre>
+ * histogram = Histogram()
+ * histogram.recordValue(0.0125)
+ * histogram.getValueAtPercentile(99)
+ * </pre>
+ * </blockquote>
+ * </p>
+"""
+
+import math
+from threading import Lock
+
+from CustomExceptions import IllegalArgumentException
+
+NANOS_PER_SECOND = 1000000000
+
+
+class Histogram:
+
+    def __init__(self, significantDigits=3):
+        """
+         * Constructs an empty <code>Histogram</code>.
+         *
+         * @param significantDigits Number of significant decimal
+         *        digits to keep for each recorded value (1 to 5).
+        """
+        if significantDigits < 1 or significantDigits > 5:
+            raise IllegalArgumentException("Significant digits must be between 1 and 5")
+        self.significantDigits = significantDigits
+        largestSingleUnitValue = 2 * 10 ** significantDigits
+        self.subBucketBits = int(math.ceil(math.log(largestSingleUnitValue, 2)))
+        self.subBucketHalfCount = 1 << (self.subBucketBits - 1)
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        """
+         * Discards all recorded values.
+        """
+        self.counts = {}
+        self.totalCount = 0
+        self.totalValue = 0
+        self.minValue = None
+        self.maxValue = None
+
+    def getIndex(self, value):
+        bucket = max(0, value.bit_length() - self.subBucketBits)
+        return bucket * self.subBucketHalfCount + (value >> bucket)
+
+    def getValueRange(self, index):
+        """
+         * Returns the lowest and highest values that are
+         * equivalent to the bucket at the specified index.
+        """
+        bucket = max(0, index // self.subBucketHalfCount - 1)
+        subBucket = index - bucket * self.subBucketHalfCount
+        return subBucket << bucket, ((subBucket + 1) << bucket) - 1
+
+    def recordValue(self, value, count=1):
+        """
+         * Records a value.
+         *
+         * @param value Value (in seconds).
+         * @param count Number of occurrences of the value.
+        """
+        if value < 0:
+            raise IllegalArgumentException("Recorded value must be >= 0")
+        nanos = int(round(value * NANOS_PER_SECOND))
+        index = self.getIndex(nanos)
+        with self.lock:
+            self.counts[index] = self.counts.get(index, 0) + count
+            self.totalCount += count
+            self.totalValue += nanos * count
+            if self.minValue is None or nanos < self.minValue:
+                self.minValue = nanos
+            if self.maxValue is None or nanos > self.maxValue:
+                self.maxValue = nanos
+
+    def __call__(self, sample):
+        self.recordValue(sample.elapsedTime)
+
+    def add(self, other):
+        """
+         * Adds the contents of another histogram to this one.
+         *
+         * @param other Histogram with the same number of
+         *        significant digits.
+        """
+        if other.significantDigits != self.significantDigits:
+            raise IllegalArgumentException("Cannot merge histograms of different precision")
+        with other.lock:
+            counts = dict(other.counts)
+            totalCount, totalValue = other.totalCount, other.totalValue
+            minValue, maxValue = other.minValue, other.maxValue
+        if not totalCount:
+            return
+        with self.lock:
+            for index, count in counts.items():
+                self.counts[index] = self.counts.get(index, 0) + count
+            self.totalCount += totalCount
+            self.totalValue += totalValue
+            if self.minValue is None or minValue < self.minValue:
+                self.minValue = minValue
+            if self.maxValue is None or maxValue > self.maxValue:
+                self.maxValue = maxValue
+
+    def newShard(self):
+        """
+         * Returns an empty histogram of the same precision, to be
+         * merged back with <code>mergeShard()</code>.
+        """
+        return Histogram(self.significantDigits)
+
+    def mergeShard(self, shard):
+        self.add(shard)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = Lock()
+
+    def getTotalCount(self):
+        return self.totalCount
+
+    def getMin(self):
+        """
+         * Returns the smallest recorded value (in seconds),
+         * or <code>None</code> if no value was recorded.
+        """
+        if self.minValue is None:
+            return None
+        return self.minValue / NANOS_PER_SECOND
+
+    def getMax(self):
+        """
+         * Returns the largest recorded value (in seconds),
+         * or <code>None</code> if no value was recorded.
+        """
+        if self.maxValue is None:
+            return None
+        return self.maxValue / NANOS_PER_SECOND
+
+    def getMean(self):
+        """
+         * Returns the mean of the recorded values (in seconds),
+         * or <code>None</code> if no value was recorded.
+        """
+        if not self.totalCount:
+            return None
+        return self.totalValue / self.totalCount / NANOS_PER_SECOND
+
+    def getValueAtPercentile(self, percentile):
+        """
+         * Returns the value (in seconds) at or below which the
+         * specified percentage of recorded values fall, or
+         * <code>None</code> if no value was recorded.
+         *
+         * @param percentile Percentile (0 to 100).
+        """
+        with self.lock:
+            if not self.totalCount:
+                return None
+            if percentile >= 100:
+                return self.maxValue / NANOS_PER_SECOND
+            countAtPercentile = max(1, int(math.ceil(percentile / 100.0 * self.totalCount)))
+            runningCount = 0
+            for index in sorted(self.counts):
+                runningCount += self.counts[index]
+                if runningCount >= countAtPercentile:
+                    highest = self.getValueRange(index)[1]
+                    value = min(max(highest, self.minValue), self.maxValue)
+                    return value / NANOS_PER_SECOND
+            return self.maxValue / NANOS_PER_SECOND
+
+    def recordedValues(self):
+        """
+         * Returns the recorded buckets as a list of
+         * <code>(value, count)</code> pairs in ascending order,
+         * where the value (in seconds) is the midpoint of the bucket.
+        """
+        with self.lock:
+            values = []
+            for index in sorted(self.counts):
+                lowest, highest = self.getValueRange(index)
+                values.append(((lowest + highest) / 2.0 / NANOS_PER_SECOND, self.counts[index]))
+            return values
+
+    def __str__(self):
+        if not self.totalCount:
+            return "Histogram: no values"
+        return ("count=%d min=%.6f p50=%.6f p90=%.6f p99=%.6f max=%.6f sec." %
+                (self.totalCount, self.getMin(), self.getValueAtPercentile(50),
+                 self.getValueAtPercentile(90), self.getValueAtPercentile(99), self.getMax()))
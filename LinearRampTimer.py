@@ -0,0 +1,71 @@
+"""
+ * The <code>LinearRampTimer</code> is a <code>Timer</code>
+ * that ramps a number of users up evenly over a period of time
+ * and, optionally, ramps them down again after a hold period.
+ * <p>
+ * For example, to start 1,000 users over 60 seconds, keep them
+ * all running for 5 minutes and then retire them over 30 seconds,
+ * use:
+ * <blockquote>
+ * <pre>
+ * timer = LinearRampTimer(1000, 60000, 300000, 30000)
+ * loadTest = LoadTest(ExampleTest("testSomething"), 1000, 1000000, timer)
+ * </pre>
+ * </blockquote>
+ * Users are retired in the order in which they were started,
+ * each one completing its current iteration.
+ * </p>
+ *
+ * @see Timer
+"""
+
+from CustomExceptions import IllegalArgumentException
+from Timer import Timer
+
+class LinearRampTimer(Timer):
+
+	def __init__(self, users, rampUpTime, holdTime=None, rampDownTime=0):
+		"""
+		 * Constructs a <code>LinearRampTimer</code>.
+		 *
+		 * @param users Number of users to ramp up.
+		 * @param rampUpTime Time between the start of the first
+		 *        and the last user (in milliseconds).
+		 * @param holdTime Time during which all users run once the
+		 *        ramp up is complete (in milliseconds), or
+		 *        <code>None</code> to let users run all of their
+		 *        iterations without ramping down.
+		 * @param rampDownTime Time between the retirement of the
+		 *        first and the last user (in milliseconds).
+		"""
+		if users < 1:
+			raise IllegalArgumentException("Number of users must be > 0")
+		if rampUpTime < 0 or rampDownTime < 0 or (holdTime is not None and holdTime < 0):
+			raise IllegalArgumentException("Ramp and hold times must be >= 0")
+		self.users = users
+		self.rampUpTime = rampUpTime
+		self.holdTime = holdTime
+		self.rampDownTime = rampDownTime
+
+	def getDelay(self):
+		"""
+		 * Returns the delay between the start of two users.
+		 *
+		 * @return Delay (in milliseconds).
+		"""
+		if self.users == 1:
+			return 0
+		return self.rampUpTime / (self.users - 1)
+
+	def getStartTime(self, user, previousStartTime):
+		return self.getRampTime(user, self.rampUpTime)
+
+	def getRetireTime(self, user):
+		if self.holdTime is None:
+			return None
+		return self.rampUpTime + self.holdTime + self.getRampTime(user, self.rampDownTime)
+
+	def getRampTime(self, user, rampTime):
+		if self.users == 1:
+			return 0
+		return rampTime * min(user, self.users - 1) / (self.users - 1)
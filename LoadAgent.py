@@ -0,0 +1,231 @@
+"""
+ * The <code>LoadAgent</code> runs a share of the users of a
+ * <code>DistributedLoadTest</code> on behalf of its coordinator.
+ * <p>
+ * An agent listens on a TCP port and serves one coordinator at a
+ * time.  The coordinator first exchanges a few time requests with
+ * it to estimate the offset between their clocks, then sends it
+ * the definition of a load test: the decorated test, the users to
+ * run and the <code>LoadTest</code> options.  The agent starts its
+ * users at the agreed time and, at a fixed interval, sends back a
+ * histogram of the iteration times of each outcome, rather than the
+ * samples themselves.  Once its users have completed, it sends back
+ * their failures and errors as a <code>RemoteOutcome</code>.
+ * </p>
+ * <p>
+ * The decorated test is pickled, so it must be picklable and its
+ * class importable by the agent.  To start an agent, run:
+ * <blockquote>
+ * <pre>
+ * python LoadAgent.py [port [host]]
+ * </pre>
+ * </blockquote>
+ * </p>
+ * <p>
+ * Messages are pickled Python objects, each sent as a frame
+ * prefixed with its length.  Agents execute whatever test a
+ * coordinator sends them, so they should only listen on trusted
+ * networks.
+ * </p>
+"""
+
+import pickle
+import socket
+import struct
+import sys
+import threading
+import time
+import traceback
+
+from Cancellation import Cancellation
+from Histogram import Histogram
+from LoadTest import LoadTest
+from ProcessPoolTest import RemoteOutcome
+
+DEFAULT_PORT = 7777
+
+FRAME_HEADER = struct.Struct("!I")
+
+
+def sendFrame(sock, message):
+    """
+     * Sends a message as a length-prefixed pickled frame.
+    """
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(FRAME_HEADER.pack(len(data)) + data)
+
+
+def receiveFrame(sock):
+    """
+     * Receives a message sent with <code>sendFrame()</code>, or
+     * returns <code>None</code> if the connection was closed.
+    """
+    header = receiveExactly(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    data = receiveExactly(sock, FRAME_HEADER.unpack(header)[0])
+    if data is None:
+        return None
+    return pickle.loads(data)
+
+
+def receiveExactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class IntervalStatistics:
+    """
+     * A sample listener that records iteration times into one
+     * histogram per outcome, for the current interval.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.intervalStart = time.time()
+        self.histograms = {}
+
+    def __call__(self, sample):
+        with self.lock:
+            histogram = self.histograms.get(sample.outcome)
+            if histogram is None:
+                histogram = self.histograms[sample.outcome] = Histogram()
+            histogram.recordValue(sample.elapsedTime)
+
+    def rotate(self):
+        """
+         * Starts a new interval and returns the start time and
+         * histograms of the one that ended.
+        """
+        with self.lock:
+            intervalStart, histograms = self.intervalStart, self.histograms
+            self.intervalStart = time.time()
+            self.histograms = {}
+        return intervalStart, histograms
+
+
+class LoadAgent:
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """
+         * Constructs a <code>LoadAgent</code> listening on the
+         * specified address.
+         *
+         * @param host Host name or address to listen on.
+         * @param port TCP port to listen on, or 0 for any free port.
+        """
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen(1)
+
+    def getAddress(self):
+        return self.server.getsockname()
+
+    def serveForever(self):
+        while True:
+            connection, address = self.server.accept()
+            try:
+                self.serve(connection)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                connection.close()
+
+    def serve(self, connection):
+        """
+         * Serves the requests of a coordinator until it disconnects.
+        """
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sendLock = threading.Lock()
+        cancellation = None
+        while True:
+            message = receiveFrame(connection)
+            if message is None:
+                break
+            if message[0] == "time":
+                with sendLock:
+                    sendFrame(connection, ("time", time.time()))
+            elif message[0] == "run":
+                cancellation = Cancellation()
+                runner = threading.Thread(target=self.runLoadTest,
+                                          args=(connection, sendLock, cancellation) + message[1:])
+                runner.daemon = True
+                runner.start()
+            elif message[0] == "cancel" and cancellation is not None:
+                cancellation.cancel()
+        if cancellation is not None:
+            cancellation.cancel()
+
+    def runLoadTest(self, connection, sendLock, cancellation, test, users, firstUser, options,
+                    startAt, interval):
+        """
+         * Runs the agent's share of the users of a load test,
+         * streaming interval statistics to the coordinator.
+         *
+         * @param startAt Time (agent clock) at which users start.
+         * @param interval Interval (sec.) between statistics.
+        """
+        statistics = IntervalStatistics()
+        outcome = RemoteOutcome()
+        done = threading.Event()
+        try:
+            loadTest = LoadTest(test, users, **options)
+            loadTest.setFirstUser(firstUser)
+            loadTest.setQuiet()
+            loadTest.addSampleListener(statistics)
+            delay = startAt - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            statistics.rotate()
+            streamer = threading.Thread(target=self.streamStatistics,
+                                        args=(connection, sendLock, statistics, interval, done))
+            streamer.daemon = True
+            streamer.start()
+            with cancellation:
+                try:
+                    loadTest.run(outcome)
+                finally:
+                    loadTest.close()
+            done.set()
+            streamer.join()
+            with sendLock:
+                sendFrame(connection, ("stats",) + statistics.rotate())
+                sendFrame(connection, ("done", outcome))
+        except Exception:
+            done.set()
+            try:
+                with sendLock:
+                    sendFrame(connection, ("error", traceback.format_exc()))
+            except OSError:
+                pass
+
+    def streamStatistics(self, connection, sendLock, statistics, interval, done):
+        while not done.wait(interval):
+            try:
+                with sendLock:
+                    sendFrame(connection, ("stats",) + statistics.rotate())
+            except OSError:
+                return
+
+    def close(self):
+        self.server.close()
+
+
+if __name__ == "__main__":
+    port = DEFAULT_PORT
+    host = "127.0.0.1"
+    if len(sys.argv) > 1:
+        port = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        host = sys.argv[2]
+    agent = LoadAgent(host, port)
+    sys.stdout.write("LoadAgent listening on %s:%d\n" % agent.getAddress())
+    sys.stdout.flush()
+    agent.serveForever()
@@ -23,13 +23,36 @@
  * </blockquote>
  * </p>
  * <p>
+ * Instead of a number of iterations, a <code>LoadTest</code> can
+ * be given a duration, during which each user runs the decorated
+ * test repeatedly, optionally preceded by a warm-up phase and
+ * followed by a cool-down phase.  For example, to run 50 users
+ * for 10 minutes, ignoring the first minute, use:
+ * <blockquote>
+ * <pre>
+ * loadTest = LoadTest(ExampleTest("testSomething"), 50, duration=540, warmUp=60)
+ * </pre>
+ * </blockquote>
+ * Only the samples of the steady-state phase are passed to the
+ * sample listeners, such as an enclosing <code>TimedTest</code>.
+ * The throughput and latency of each phase are printed when the
+ * load test completes and are available from
+ * <code>getPhaseStatistics()</code>.
+ * </p>
+ * <p>
  * The load can be ramped by specifying a pluggable 
  * <code>Timer</code> instance which prescribes the delay
  * between the addition of each concurrent user.  A
  * <code>ConstantTimer</code> has a constant delay, with 
  * a zero value indicating that all users will be started 
  * simultaneously. A <code>RandomTimer</code> has a random 
- * delay with a uniformly distributed variation.
+ * delay with a uniformly distributed variation, and a
+ * <code>PoissonTimer</code> an exponentially distributed delay.
+ * A <code>LinearRampTimer</code> or a <code>SteppedRampTimer</code>
+ * ramps users up over a period of time and, after an optional
+ * hold period, retires them again.  Users are started at absolute
+ * times measured from the start of the load test, so the time it
+ * takes to start each user does not add to the ramp.
  * </p>
  * <p>
  * For example, to create a load test of 10 concurrent users
@@ -95,6 +118,49 @@
  * wait for the completion of all threads belonging to the same 
  * <code>ThreadGroup</code> as the thread running the decorated test.
  * </p>
+ * <p>
+ * Users are simulated by threads by default.  To run CPU-bound
+ * tests on more than one core, a <code>LoadTest</code> can instead
+ * distribute its users across a pool of worker processes:
+ * <blockquote>
+ * <pre>
+ * loadTest = LoadTest(ExampleTest("testSomething"), 10, executor="process")
+ * </pre>
+ * </blockquote>
+ * The decorated test must then be picklable.  Failures, errors
+ * and timings are sent back to the test result of the parent
+ * process as each user completes.  The worker processes are
+ * started by the first run and kept for the next ones, until the
+ * load test is closed:
+ * <blockquote>
+ * <pre>
+ * with LoadTest(ExampleTest("testSomething"), 10, executor="process") as loadTest:
+ *     TimedTest(loadTest, 2).run(result)
+ * </pre>
+ * </blockquote>
+ * </p>
+ * <p>
+ * Alternatively, users can be run by the long-lived threads of a
+ * <code>WorkerPool</code> shared by several load tests, so that
+ * thread start-up is kept out of the timed tests:
+ * <blockquote>
+ * <pre>
+ * pool = WorkerPool(10)
+ * loadTest = LoadTest(ExampleTest("testSomething"), 10, executor=pool)
+ * </pre>
+ * </blockquote>
+ * </p>
+ * <p>
+ * To make sure that all users really run at the same time, a
+ * <code>LoadTest</code> can be constructed with
+ * <code>startGate=True</code>.  The threads of all users are then
+ * started first and parked at a <code>StartGate</code>, which is
+ * opened once all of them are waiting; the timer's start times are
+ * not used.  The start skew between users and the peak number of
+ * iterations in progress at once are printed when the load test
+ * completes.  A start gate is not available with worker processes,
+ * and a <code>WorkerPool</code> must have a thread for every user.
+ * </p>
  * @author <b>Mike Clark</b>
  * @author Clarkware Consulting, Inc.
  * @author Ervin Varga
@@ -103,26 +169,31 @@
  **************************************
 """
 
+import os
+import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
 from threading import Thread
 from unittest import TestResult, TestCase
 from Test import Test
 from RepeatedTest import RepeatedTest
+from Cancellation import Cancellation
 from ConstantTimer import ConstantTimer
 from CustomExceptions import IllegalArgumentException
+from DurationTest import DurationTest
+from PhaseStatistics import PhaseStatistics, SteadyStateListener
 from ThreadBarrier import ThreadBarrier
 from ThreadedTestGroup import ThreadedTestGroup
 from ThreadedTest import ThreadedTest
+from ProcessPoolTest import ProcessPoolTest
+from StartGate import InFlightConcurrency, StartGate
+from VirtualUser import VirtualUser
+from WorkerPool import WorkerPool
 
-try:
-	bool = True
-except:
-	True = 1
-	False = 0
-	
 class LoadTest(Test):
 
-	def __init__(self, test, users, iterations=0, timer=None):
+	def __init__(self, test, users, iterations=0, timer=None, executor="thread", workers=None,
+				 duration=None, warmUp=0, coolDown=0, startGate=False):
 		"""
 		 * Constructs a <code>LoadTest</code> to decorate 
 		 * the specified test using the specified number 
@@ -134,7 +205,25 @@ class LoadTest(Test):
 		 * @param users Number of concurrent users.
 		 * @param iterations Number of iterations per user.
 		 * @param timer Delay timer.
+		 * @param executor <code>"thread"</code> (default) to simulate
+		 *        each user with a new thread, <code>"process"</code> to
+		 *        run users in a pool of worker processes, or a
+		 *        <code>WorkerPool</code> to run users in its threads.
+		 * @param workers Number of worker processes (defaults to the
+		 *        number of CPUs, at most one per user).
+		 * @param duration Duration of the steady-state phase (sec.)
+		 *        during which users run the test repeatedly, instead
+		 *        of a number of iterations.
+		 * @param warmUp Duration of the warm-up phase (sec.).
+		 * @param coolDown Duration of the cool-down phase (sec.).
+		 * @param startGate <code>true</code> to park all users at a
+		 *        <code>StartGate</code> and release them together.
 		"""
+		if iterations and duration:
+			raise IllegalArgumentException("Either iterations or a duration may be given")
+		self.durationTest = None
+		if duration:
+			test = self.durationTest = DurationTest(test, duration, warmUp, coolDown)
 		if iterations:
 			test = RepeatedTest(test, iterations)
 		if timer is None:
@@ -146,13 +235,97 @@ class LoadTest(Test):
 			raise IllegalArgumentException("Delay timer is null")
 		if test is None:
 			raise IllegalArgumentException("Decorated test is null")
+		if not isinstance(executor, WorkerPool) and executor not in ("thread", "process"):
+			raise IllegalArgumentException("Executor must be 'thread', 'process' or a WorkerPool")
+		if startGate and executor == "process":
+			raise IllegalArgumentException("A start gate cannot park users in worker processes")
+		if startGate and isinstance(executor, WorkerPool) and executor.size < users:
+			raise IllegalArgumentException("A start gate requires a worker pool thread for each user")
 
 		self.users = users
+		self.firstUser = 0
 		self.timer = timer
+		self.executor = executor
+		self.workers = workers or min(users, os.cpu_count() or 1)
+		self.processPool = None
 		self.setEnforceTestAtomicity(False)
 		self.barrier = ThreadBarrier(users)
 		self.group = ThreadedTestGroup(self, "LoadTest:ThreadedTestGroup")
-		self.test = ThreadedTest(test, self.group, self.barrier)
+		if executor == "process":
+			self.test = ProcessPoolTest(test, self.barrier)
+		elif isinstance(executor, WorkerPool):
+			self.test = ThreadedTest(test, self.group, self.barrier, executor, sharded=True)
+		else:
+			self.test = ThreadedTest(test, self.group, self.barrier, sharded=True)
+		self.isQuiet = False
+		self.startGate = startGate
+		self.gate = None
+		self.inFlightConcurrency = None
+		if startGate:
+			self.inFlightConcurrency = InFlightConcurrency()
+			self.test.addSampleListener(self.inFlightConcurrency)
+		self.phaseStatistics = None
+		if self.durationTest is not None:
+			self.phaseStatistics = PhaseStatistics(self.durationTest.getPhases())
+			self.test.addSampleListener(self.phaseStatistics)
+
+	def startProcessPool(self):
+		"""
+		 * Starts the pool of worker processes and waits until it
+		 * has run one task per worker.  With the "fork" start
+		 * method, the pool starts all of its workers at once; with
+		 * "spawn" or "forkserver", it only starts a new worker for
+		 * a task while none is idle, so that a worker that has
+		 * already completed its task may take another one and
+		 * leave the last workers to be started by the first run.
+		"""
+		self.processPool = ProcessPoolExecutor(max_workers=self.workers)
+		for future in [self.processPool.submit(os.getpid) for i in range(self.workers)]:
+			future.result()
+		self.test.setExecutor(self.processPool)
+
+	def setQuiet(self):
+		"""
+		 * Disables the output of the phase statistics.
+		"""
+		self.isQuiet = True
+
+	def setFirstUser(self, firstUser):
+		"""
+		 * Sets the index of the first user run by this load test,
+		 * when it runs a share of the users of a larger one, such
+		 * as on an agent of a <code>DistributedLoadTest</code>.
+		 * The users are then started at the times the timer gives
+		 * for their indices in the larger load test.
+		"""
+		self.firstUser = firstUser
+
+	def getStartSkew(self):
+		"""
+		 * Returns the time (sec.) between the first and the last
+		 * user leaving the start gate during the last run, or
+		 * <code>None</code> without a start gate.
+		"""
+		if self.gate is None:
+			return None
+		return self.gate.getStartSkew()
+
+	def getPeakConcurrency(self):
+		"""
+		 * Returns the largest number of iterations in progress at
+		 * the same time during the last run, or <code>None</code>
+		 * without a start gate.
+		"""
+		if self.inFlightConcurrency is None:
+			return None
+		return self.inFlightConcurrency.getPeakConcurrency()
+
+	def getPhaseStatistics(self):
+		"""
+		 * Returns the <code>PhaseStatistics</code> of the last run,
+		 * or <code>None</code> if the load test has no duration.
+		"""
+		return self.phaseStatistics
 	
 	def setEnforceTestAtomicity(self, isAtomic):
 		"""
@@ -179,6 +352,11 @@ class LoadTest(Test):
 		"""
 		return self.users * self.test.countTestCases()
 
+	def addSampleListener(self, listener):
+		if self.durationTest is not None:
+			listener = SteadyStateListener(listener)
+		return self.test.addSampleListener(listener)
+
 	def run(self, result):
 		"""
 		 * Runs the test.
@@ -186,15 +364,78 @@ class LoadTest(Test):
 		 * @param result Test result.
 		"""
 		self.group.setTestResult(result)
+		self.barrier.reset()
+		if self.executor == "process" and self.processPool is None:
+			self.startProcessPool()
+		startTime = time.perf_counter()
+		if self.durationTest is not None:
+			self.phaseStatistics.reset()
+			self.durationTest.begin(startTime)
+		if self.startGate:
+			self.runGated(result)
+			return
+		userStartTime = 0
+		for i in range(self.firstUser):
+			userStartTime = self.timer.getStartTime(i, userStartTime)
 		for i in range(self.users):
 			#if result.shouldStop():
 			#	self.barrier.cancelThreads(self.users - i)
 			#	break
-			self.test.run(result)
-			self.sleep(self.getDelay())
+			if Cancellation.isCurrentCancelled():
+				self.barrier.cancelThreads(self.users - i)
+				break
+			user = self.firstUser + i
+			userStartTime = self.timer.getStartTime(user, userStartTime)
+			self.sleepUntil(startTime + userStartTime * 0.001)
+			self.test.run(result, self.createUser(user, startTime))
 		
 		self.waitForTestCompletion()
 		self.cleanup()
+		if self.phaseStatistics is not None:
+			self.printPhaseStatistics()
+
+	def runGated(self, result):
+		"""
+		 * Starts all users parked at a start gate, then opens it.
+		 *
+		 * @param result Test result.
+		"""
+		self.gate = StartGate(self.users)
+		self.inFlightConcurrency.reset()
+		users = []
+		for i in range(self.users):
+			if Cancellation.isCurrentCancelled():
+				self.barrier.cancelThreads(self.users - i)
+				break
+			user = self.createUser(self.firstUser + i, 0)
+			users.append(user)
+			self.test.run(result, user, self.gate)
+		self.gate.waitForUsers(len(users))
+		startTime = time.perf_counter()
+		for user in users:
+			if user.retireTime is not None:
+				user.retireTime += startTime
+		if self.durationTest is not None:
+			self.durationTest.begin(startTime)
+		self.gate.open()
+
+		self.waitForTestCompletion()
+		self.cleanup()
+		if self.phaseStatistics is not None:
+			self.printPhaseStatistics()
+		self.printStartGate()
+
+	def printStartGate(self):
+		if not self.isQuiet:
+			sys.stdout.write(str(self) + ": start skew " + str(self.getStartSkew()) +
+							 " sec., peak concurrency " + str(self.getPeakConcurrency()) +
+							 " of " + str(self.users) + " users\n")
+			sys.stdout.flush()
+
+	def printPhaseStatistics(self):
+		if not self.isQuiet:
+			sys.stdout.write(str(self) + ":\n" + str(self.phaseStatistics) + "\n")
+			sys.stdout.flush()
 
 	def __call__(self, result):
 		self.run(result)
@@ -204,19 +445,47 @@ class LoadTest(Test):
 		// TODO: May require a strategy pattern
 		//       if other algorithms emerge.
 		"""
-		if self.enforceTestAtomicity:
+		cancellation = Cancellation.current()
+		if cancellation is not None:
+			cancellation.addCallback(self.stopWaiting)
+		if self.enforceTestAtomicity and self.executor != "process":
 			self.waitForAllThreadsToComplete()
 		else:
 			self.waitForThreadedTestThreadsToComplete()
+		if self.executor != "process":
+			self.test.mergeShards()
 
 	def waitForThreadedTestThreadsToComplete(self):
-		while not self.barrier.isReached():
-			self.sleep(50)
+		self.barrier.waitForCompletion()
 	
 	def waitForAllThreadsToComplete(self):
-		while self.group.activeCount() > 0:
-			self.sleep(50)
+		self.group.waitForAllThreads()
+
+	def stopWaiting(self):
+		"""
+		 * Stops waiting for the users to complete once the
+		 * load test has been cancelled.
+		"""
+		self.barrier.cancelThreads(self.users)
+		self.group.release()
+		if self.gate is not None:
+			self.gate.open()
 	
+	def createUser(self, user, startTime):
+		retireTime = self.timer.getRetireTime(user)
+		if retireTime is not None:
+			retireTime = startTime + retireTime * 0.001
+		return VirtualUser(user, retireTime)
+
+	def sleepUntil(self, deadline):
+		"""
+		 * Sleeps until the specified value of the monotonic
+		 * <code>time.perf_counter()</code> clock.
+		"""
+		delay = deadline - time.perf_counter()
+		if delay > 0:
+			time.sleep(delay)
+
 	def sleep(self, ms):
 		try:
 			time.sleep(ms*0.001)
@@ -224,11 +493,31 @@ class LoadTest(Test):
 			pass
 	
 	def cleanup(self):
+		if self.processPool is not None and Cancellation.isCurrentCancelled():
+			self.processPool.shutdown(wait=False, cancel_futures=True)
+			self.processPool = None
 		try:
 			self.group.destroy()
 		except:
 			pass
 	
+	def close(self):
+		"""
+		 * Shuts down the worker processes and waits for them to
+		 * exit.  A worker process still running a test is waited
+		 * for, but the tests not started yet are cancelled.
+		"""
+		if self.processPool is not None:
+			self.processPool.shutdown(cancel_futures=True)
+			self.processPool = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+		return False
+
 	def __str__(self):
 		if self.enforceTestAtomicity:
 			return "LoadTest (ATOMIC): " + str(self.test)
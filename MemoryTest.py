@@ -0,0 +1,180 @@
+"""
+ * The <code>MemoryTest</code> is a test decorator that runs a
+ * test and measures the memory it allocates, using
+ * <code>tracemalloc</code>.
+ * <p>
+ * A <code>MemoryTest</code> is constructed with limits on any of:
+ * <ul>
+ * <li>the peak traced memory during the run, above the memory
+ *     traced when the run began,</li>
+ * <li>the net memory still retained after the run, once garbage
+ *     has been collected, and</li>
+ * <li>the net number of memory blocks still allocated after the
+ *     run.</li>
+ * </ul>
+ * Like a waiting <code>TimedTest</code>, it runs its decorated test
+ * to completion and then signals a failure for each limit exceeded.
+ * The failure lists the source lines that allocated the most memory
+ * during the run.
+ * </p>
+ * <p>
+ * For example, to require a load test of 10 users to peak below
+ * 50 MB and to retain less than 1 MB, use:
+ * <blockquote>
+ * <pre>
+ * memoryTest = MemoryTest(LoadTest(ExampleTest("testSomething"), 10),
+ *                         maxPeak=50 * 1024 * 1024, maxRetained=1024 * 1024)
+ * </pre>
+ * </blockquote>
+ * </p>
+ * <p>
+ * <code>tracemalloc</code> traces the whole process, so allocations
+ * from all the threads of a <code>LoadTest</code> are measured, but
+ * not those of its worker processes.  Since the peak is global, a
+ * <code>MemoryTest</code> should decorate a <code>LoadTest</code>
+ * rather than be run concurrently by one.  Decorating a
+ * <code>MemoryTest</code> with a <code>RepeatedTest</code> checks
+ * every repetition, whereas decorating a <code>RepeatedTest</code>
+ * checks the repetitions as a whole.
+ * </p>
+"""
+
+import gc
+import sys
+import tracemalloc
+
+from CustomExceptions import AssertionFailedError, IllegalArgumentException
+from TestDecorator import TestDecorator
+
+
+class MemoryTest(TestDecorator):
+
+    def __init__(self, test, maxPeak=None, maxRetained=None, maxBlocks=None, topSites=10, frames=1):
+        """
+         * Constructs a <code>MemoryTest</code> to decorate the
+         * specified test with the specified memory limits.
+         *
+         * @param test Test to decorate.
+         * @param maxPeak Maximum peak traced memory (bytes), or
+         *        <code>None</code>.
+         * @param maxRetained Maximum net retained memory (bytes),
+         *        or <code>None</code>.
+         * @param maxBlocks Maximum net number of allocated memory
+         *        blocks, or <code>None</code>.
+         * @param topSites Number of allocation sites reported
+         *        when a limit is exceeded.
+         * @param frames Number of stack frames kept for each
+         *        allocation, when tracing is started by this test.
+        """
+        TestDecorator.__init__(self, test)
+        for limit in (maxPeak, maxRetained, maxBlocks):
+            if limit is not None and limit < 0:
+                raise IllegalArgumentException("Memory limits must be >= 0")
+        self.maxPeak = maxPeak
+        self.maxRetained = maxRetained
+        self.maxBlocks = maxBlocks
+        self.topSites = topSites
+        self.frames = frames
+        self.isQuiet = False
+        self.peak = None
+        self.retained = None
+        self.blocks = None
+        self.topStatistics = []
+
+    def setQuiet(self):
+        """
+         * Disables the output of the test's memory usage.
+        """
+        self.isQuiet = True
+
+    def countTestCases(self):
+        return TestDecorator.countTestCases(self)
+
+    def getPeak(self):
+        """
+         * Returns the peak traced memory (bytes) of the last run.
+        """
+        return self.peak
+
+    def getRetained(self):
+        """
+         * Returns the net retained memory (bytes) of the last run.
+        """
+        return self.retained
+
+    def getBlocks(self):
+        """
+         * Returns the net number of allocated memory blocks
+         * of the last run.
+        """
+        return self.blocks
+
+    def run(self, result):
+        startedTracing = not tracemalloc.is_tracing()
+        if startedTracing:
+            tracemalloc.start(self.frames)
+        try:
+            self.runTraced(result)
+        finally:
+            if startedTracing:
+                tracemalloc.stop()
+        self.printMemoryUsage()
+        self.checkLimits(result)
+
+    def __call__(self, result):
+        self.run(result)
+
+    def runTraced(self, result):
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        TestDecorator.run(self, result)
+        peak = tracemalloc.get_traced_memory()[1]
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+        self.peak = peak - baseline
+        self.retained = tracemalloc.get_traced_memory()[0] - baseline
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                   tracemalloc.Filter(False, __file__)]
+        differences = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+        self.blocks = sum(difference.count_diff for difference in differences)
+        self.topStatistics = [d for d in differences if d.size_diff > 0][:self.topSites]
+
+    def checkLimits(self, result):
+        """
+         * Signals a failure for each memory limit exceeded
+         * by the last run.
+         *
+         * @param result Test result.
+        """
+        self.checkLimit(result, "Peak memory", self.maxPeak, self.peak, " bytes")
+        self.checkLimit(result, "Retained memory", self.maxRetained, self.retained, " bytes")
+        self.checkLimit(result, "Allocated blocks", self.maxBlocks, self.blocks, "")
+
+    def checkLimit(self, result, name, limit, value, unit):
+        if limit is not None and value > limit:
+            result.addFailure(self.getTest(),
+                              (AssertionFailedError,
+                               AssertionFailedError(name + " exceeded! Expected " + str(limit) + unit +
+                                                    ", but was " + str(value) + unit +
+                                                    self.getTopSites()), None))
+            result.stop()
+
+    def getTopSites(self):
+        """
+         * Returns the allocation sites that grew the most
+         * during the last run.
+        """
+        if not self.topStatistics:
+            return ""
+        return "\n\nTop allocation sites:\n" + "\n".join(str(s) for s in self.topStatistics)
+
+    def printMemoryUsage(self):
+        if not self.isQuiet:
+            sys.stdout.write(str(self) + ": peak " + str(self.peak) + " bytes, retained " +
+                             str(self.retained) + " bytes, " + str(self.blocks) + " blocks\n")
+            sys.stdout.flush()
+
+    def __str__(self):
+        return "MemoryTest: " + str(self.test)
@@ -0,0 +1,209 @@
+"""
+ * The <code>MicroBenchmarkTest</code> is a test that measures the
+ * time per call of a function taking microseconds or less.
+ * <p>
+ * A <code>TestCaseWithParameters</code> goes through
+ * <code>unittest.TestCase.run()</code> and its fixtures for every
+ * call, which costs more than a very fast function.  A
+ * <code>MicroBenchmarkTest</code> instead calls the function in a
+ * tight loop, in batches whose size is calibrated so that each batch
+ * lasts a target time, and times each batch with
+ * <code>time.perf_counter_ns()</code>.  The cost of the bare loop,
+ * without any call, is subtracted from the raw time of each batch,
+ * and the net time per call is reported as the median over the
+ * batches with its median absolute deviation, next to the raw time
+ * per call.  A net time below zero, when the function costs less
+ * than the timing resolution, is reported as such rather than
+ * hidden.
+ * </p>
+ * <p>
+ * Each batch is published as a sample whose elapsed time is the
+ * raw time per call, so percentiles of the time per call can be
+ * asserted by an enclosing <code>TimedTest</code>:
+ * <blockquote>
+ * <pre>
+ * benchmark = MicroBenchmarkTest(len, "abc")
+ * timedTest = TimedTest(benchmark, 10, percentileLimits={50: 100e-9})
+ * </pre>
+ * </blockquote>
+ * A <code>MicroBenchmarkTest</code> can also be decorated as a
+ * <code>LoadTest</code>, each user then running the benchmark.
+ * </p>
+"""
+
+import sys
+import time
+from statistics import median
+
+from CustomExceptions import AssertionFailedError, IllegalArgumentException
+from Sample import Sample, getCurrentUserId, publishSample
+from Test import Test
+
+
+class MicroBenchmarkTest(Test):
+
+    def __init__(self, method, *args, batches=20, targetBatchTime=0.01, maxTimePerCall=None):
+        """
+         * Constructs a <code>MicroBenchmarkTest</code>.
+         *
+         * @param method Function to benchmark.
+         * @param args Arguments the function is called with.
+         * @param batches Number of timed batches.
+         * @param targetBatchTime Duration (sec.) of each batch.
+         * @param maxTimePerCall Maximum median net time per call
+         *        (sec.), or <code>None</code> not to assert on it.
+        """
+        if batches < 1:
+            raise IllegalArgumentException("Number of batches must be > 0")
+        if targetBatchTime <= 0:
+            raise IllegalArgumentException("Target batch time must be > 0")
+        self.method = method
+        self.args = args
+        self.batches = batches
+        self.targetBatchTime = targetBatchTime
+        self.maxTimePerCall = maxTimePerCall
+        self.sampleListeners = []
+        self.isQuiet = False
+        self.batchSize = None
+        self.overhead = None
+        self.timesPerCall = []
+        self.rawTimesPerCall = []
+
+    def setQuiet(self):
+        """
+         * Disables the output of the time per call.
+        """
+        self.isQuiet = True
+
+    def countTestCases(self):
+        return 1
+
+    def addSampleListener(self, listener):
+        """
+         * Registers a sample listener.  Each batch is recorded
+         * as a sample whose elapsed time is the raw time per call.
+        """
+        self.sampleListeners.append(listener)
+        return True
+
+    def run(self, result):
+        result.startTest(self)
+        try:
+            self.benchmark()
+        except AssertionFailedError:
+            result.addFailure(self, sys.exc_info())
+        except Exception:
+            result.addError(self, sys.exc_info())
+        else:
+            result.addSuccess(self)
+        finally:
+            result.stopTest(self)
+
+    def __call__(self, result):
+        self.run(result)
+
+    def benchmark(self):
+        batchSize = self.calibrate()
+        overhead = self.getOverhead(batchSize)
+        timesPerCall = []
+        rawTimesPerCall = []
+        for i in range(self.batches):
+            beginTime = time.time()
+            nanos = self.timeBatch(self.method, batchSize)
+            rawTimesPerCall.append(nanos / batchSize * 1e-9)
+            timesPerCall.append((nanos - overhead) / batchSize * 1e-9)
+            publishSample(self.sampleListeners, Sample(beginTime, rawTimesPerCall[-1], getCurrentUserId()))
+        self.batchSize = batchSize
+        self.overhead = overhead
+        self.timesPerCall = timesPerCall
+        self.rawTimesPerCall = rawTimesPerCall
+        self.printTimePerCall()
+        if self.maxTimePerCall is not None and self.getMedian() > self.maxTimePerCall:
+            raise AssertionFailedError("Maximum time per call exceeded! Expected " +
+                                       str(self.maxTimePerCall) + " sec., but was " +
+                                       str(self.getMedian()) + " sec.")
+
+    def timeBatch(self, method, batchSize):
+        args = self.args
+        loop = range(batchSize)
+        start = time.perf_counter_ns()
+        for i in loop:
+            method(*args)
+        return time.perf_counter_ns() - start
+
+    def calibrate(self):
+        """
+         * Returns the number of calls lasting at least the
+         * target batch time.
+        """
+        batchSize = 1
+        while True:
+            if self.timeBatch(self.method, batchSize) >= self.targetBatchTime * 1e9:
+                return batchSize
+            batchSize *= 2
+
+    def timeLoop(self, batchSize):
+        loop = range(batchSize)
+        start = time.perf_counter_ns()
+        for i in loop:
+            pass
+        return time.perf_counter_ns() - start
+
+    def getOverhead(self, batchSize):
+        """
+         * Returns the time (ns) taken by the bare loop of a batch,
+         * the smallest of several measurements.
+        """
+        return min(self.timeLoop(batchSize) for i in range(5))
+
+    def getMedian(self):
+        """
+         * Returns the median net time per call (sec.) of the last
+         * run, which is negative if the function costs less than
+         * the timing resolution.
+        """
+        if not self.timesPerCall:
+            return None
+        return median(self.timesPerCall)
+
+    def getRawMedian(self):
+        """
+         * Returns the median raw time per call (sec.) of the last
+         * run, loop overhead included.
+        """
+        if not self.rawTimesPerCall:
+            return None
+        return median(self.rawTimesPerCall)
+
+    def isBelowResolution(self):
+        """
+         * Returns <code>true</code> if the net time per call of the
+         * last run is not above the loop overhead.
+        """
+        return self.getMedian() <= 0
+
+    def getMedianAbsoluteDeviation(self):
+        """
+         * Returns the median absolute deviation of the time per
+         * call (sec.) of the last run.
+        """
+        m = self.getMedian()
+        if m is None:
+            return None
+        return median([abs(t - m) for t in self.timesPerCall])
+
+    def printTimePerCall(self):
+        if not self.isQuiet:
+            line = (str(self) + ": %.1f ns/call +- %.1f net (median, MAD), %.1f ns/call raw, "
+                    "over %d batches of %d calls, loop overhead %.1f ns/call" %
+                    (self.getMedian() * 1e9, self.getMedianAbsoluteDeviation() * 1e9,
+                     self.getRawMedian() * 1e9, len(self.timesPerCall), self.batchSize,
+                     self.overhead / self.batchSize))
+            if self.isBelowResolution():
+                line += " (net time below the loop overhead, not resolved)"
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+    def __str__(self):
+        return ("MicroBenchmarkTest: " + str(getattr(self.method, "__name__", self.method)) +
+                "->" + str(self.args))
@@ -0,0 +1,324 @@
+"""
+ * A <code>ParameterFeed</code> supplies a fresh tuple of arguments
+ * to each call of a <code>TestCaseWithParameters</code>, instead of
+ * the same arguments for every user and iteration.
+ * <p>
+ * Feeds read their source lazily, one record at a time, so that
+ * input corpora larger than memory can be used.  A feed can be
+ * divided into partitions, each read by its own cursor: the users
+ * of a load test then read the partition of their index modulo the
+ * number of partitions, so that no two users share a partition
+ * when there are as many partitions as users.  When a partition is
+ * exhausted, it wraps around to its first record, or raises a
+ * <code>FeedExhaustedError</code> if wrapping around is disabled.
+ * </p>
+ * <p>
+ * For example, to call <code>lookup(key, value)</code> with the rows
+ * of a CSV file, each of 10 users reading its own part of the file:
+ * <blockquote>
+ * <pre>
+ * feed = CsvFeed("keys.csv", partitions=10)
+ * timedTest = TestCaseWithParameters.load_test_case(lookup, 5, 10, 100, feed)
+ * </pre>
+ * </blockquote>
+ * </p>
+ * <p>
+ * Feeds are picklable, for use in worker processes, where they
+ * are read again from the beginning of each partition.
+ * </p>
+"""
+
+import csv
+import itertools
+import json
+import mmap
+import os
+import struct
+from threading import Lock
+
+from CustomExceptions import FeedExhaustedError, IllegalArgumentException
+from Sample import getCurrentUserId
+
+
+class ParameterFeed:
+
+    def __init__(self, partitions=1, wrap=True):
+        """
+         * Constructs a <code>ParameterFeed</code>.
+         *
+         * @param partitions Number of partitions.
+         * @param wrap <code>true</code> to wrap around to the first
+         *        record of a partition once it is exhausted.
+        """
+        if partitions < 1:
+            raise IllegalArgumentException("Number of partitions must be > 0")
+        self.partitions = partitions
+        self.wrap = wrap
+        self.lock = Lock()
+        self.cursors = {}
+
+    def next(self, userId=None):
+        """
+         * Returns the next tuple of arguments for a user.
+         *
+         * @param userId Index of the user, or <code>None</code> for
+         *        the user being run.
+        """
+        if userId is None:
+            userId = getCurrentUserId() or 0
+        partition = userId % self.partitions
+        with self.lock:
+            cursor = self.cursors.get(partition)
+            if cursor is None:
+                cursor = self.cursors[partition] = Cursor(self, partition)
+        return cursor.next()
+
+    def __call__(self):
+        return self.next()
+
+    def openPartition(self, partition):
+        """
+         * Returns an iterator over the records of a partition.
+         * Records that are not tuples are passed as a single
+         * argument.  "Abstract" method
+         *
+         * @param partition Index of the partition.
+        """
+        None
+
+    def close(self):
+        with self.lock:
+            cursors, self.cursors = self.cursors, {}
+        for cursor in cursors.values():
+            cursor.close()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["lock"]
+        state["cursors"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = Lock()
+
+    def __str__(self):
+        return self.__class__.__name__
+
+    def __repr__(self):
+        return str(self)
+
+
+class Cursor:
+    """
+     * Reads the records of one partition of a feed.
+    """
+
+    def __init__(self, feed, partition):
+        self.feed = feed
+        self.partition = partition
+        self.lock = Lock()
+        self.records = None
+
+    def next(self):
+        with self.lock:
+            if self.records is None:
+                self.records = self.feed.openPartition(self.partition)
+            for record in self.records:
+                return toArguments(record)
+            self.close()
+            if not self.feed.wrap:
+                raise FeedExhaustedError("Partition " + str(self.partition) + " of " +
+                                         str(self.feed) + " is exhausted")
+            self.records = self.feed.openPartition(self.partition)
+            for record in self.records:
+                return toArguments(record)
+            raise FeedExhaustedError("Partition " + str(self.partition) + " of " +
+                                     str(self.feed) + " is empty")
+
+    def close(self):
+        close = getattr(self.records, "close", None)
+        if close is not None:
+            close()
+        self.records = None
+
+
+def toArguments(record):
+    if isinstance(record, tuple):
+        return record
+    return (record,)
+
+
+class GeneratorFeed(ParameterFeed):
+    """
+     * Feeds the records of an iterable created by a factory,
+     * such as a generator function.  Partition <i>k</i> of
+     * <i>n</i> takes every <i>n</i>-th record from the <i>k</i>-th.
+    """
+
+    def __init__(self, factory, partitions=1, wrap=True):
+        """
+         * @param factory Callable returning a new iterable over
+         *        the records, called again to wrap around.
+        """
+        ParameterFeed.__init__(self, partitions, wrap)
+        self.factory = factory
+
+    def openPartition(self, partition):
+        return itertools.islice(iter(self.factory()), partition, None, self.partitions)
+
+    def __str__(self):
+        return "GeneratorFeed: " + str(getattr(self.factory, "__name__", self.factory))
+
+
+class LineFeed(ParameterFeed):
+    """
+     * Feeds the lines of a text file, parsed by subclasses.
+     * Partitions are equal byte ranges of the file, adjusted
+     * to start at the beginning of a line.
+    """
+
+    def __init__(self, path, partitions=1, wrap=True, header=False, encoding="utf-8"):
+        """
+         * @param path Path of the file, one record per line.
+         * @param header <code>true</code> to skip the first line.
+         * @param encoding Encoding of the file.
+        """
+        ParameterFeed.__init__(self, partitions, wrap)
+        self.path = path
+        self.header = header
+        self.encoding = encoding
+
+    def getRange(self, partition):
+        size = os.path.getsize(self.path)
+        return size * partition // self.partitions, size * (partition + 1) // self.partitions
+
+    def openPartition(self, partition):
+        start, end = self.getRange(partition)
+        return self.readLines(start, end)
+
+    def readLines(self, start, end):
+        """
+         * Yields the parsed lines starting within a byte range.
+        """
+        with open(self.path, "rb") as f:
+            if start > 0:
+                f.seek(start - 1)
+                f.readline()
+            elif self.header:
+                f.readline()
+            while f.tell() < end:
+                line = f.readline()
+                if not line:
+                    return
+                line = line.decode(self.encoding).rstrip("\r\n")
+                if line:
+                    yield self.parseLine(line)
+
+    def parseLine(self, line):
+        """
+         * Returns the record of a non-empty line, without its line
+         * break: a tuple of the arguments of a call, or a single
+         * argument.  "Abstract" method
+        """
+        None
+
+    def __str__(self):
+        return self.__class__.__name__ + ": " + str(self.path)
+
+
+class CsvFeed(LineFeed):
+    """
+     * Feeds the rows of a CSV file as tuples of strings.
+     * Quoted fields may not contain line breaks.
+    """
+
+    def __init__(self, path, partitions=1, wrap=True, header=True, encoding="utf-8", dialect="excel"):
+        LineFeed.__init__(self, path, partitions, wrap, header, encoding)
+        self.dialect = dialect
+
+    def parseLine(self, line):
+        return tuple(next(csv.reader([line], self.dialect)))
+
+
+class JsonLinesFeed(LineFeed):
+    """
+     * Feeds the values of a JSON Lines file.  A JSON array is
+     * passed as the arguments, any other value as one argument.
+    """
+
+    def parseLine(self, line):
+        value = json.loads(line)
+        if isinstance(value, list):
+            return tuple(value)
+        return value
+
+
+class BinaryFeed(ParameterFeed):
+    """
+     * Feeds the fixed-size records of a binary file, memory
+     * mapped and unpacked with a <code>struct</code> format.
+     * Partitions are equal ranges of records.
+    """
+
+    def __init__(self, path, recordFormat, partitions=1, wrap=True):
+        """
+         * @param path Path of the file.
+         * @param recordFormat <code>struct</code> format of a record.
+        """
+        ParameterFeed.__init__(self, partitions, wrap)
+        self.path = path
+        self.recordFormat = recordFormat
+        self.recordStruct = struct.Struct(recordFormat)
+        self.map = None
+        self.views = {}
+
+    def getMap(self):
+        with self.lock:
+            if self.map is None:
+                with open(self.path, "rb") as f:
+                    self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self.map
+
+    def openPartition(self, partition):
+        records = os.path.getsize(self.path) // self.recordStruct.size
+        start = records * partition // self.partitions
+        end = records * (partition + 1) // self.partitions
+        view = memoryview(self.getMap())[start * self.recordStruct.size:
+                                         end * self.recordStruct.size]
+        with self.lock:
+            previous = self.views.get(partition)
+            self.views[partition] = view
+        if previous is not None:
+            previous.release()
+        return self.recordStruct.iter_unpack(view)
+
+    def close(self):
+        """
+         * Closes the cursors, releases the views of the partitions
+         * and closes the memory map.  A <code>BufferError</code> is
+         * raised, and the map is kept, if records are still being
+         * unpacked from it.
+        """
+        ParameterFeed.close(self)
+        with self.lock:
+            views, self.views = self.views, {}
+            for view in views.values():
+                view.release()
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+
+    def __getstate__(self):
+        state = ParameterFeed.__getstate__(self)
+        del state["recordStruct"]
+        state["map"] = None
+        state["views"] = {}
+        return state
+
+    def __setstate__(self, state):
+        ParameterFeed.__setstate__(self, state)
+        self.recordStruct = struct.Struct(self.recordFormat)
+
+    def __str__(self):
+        return "BinaryFeed: " + str(self.path)
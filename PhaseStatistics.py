@@ -0,0 +1,89 @@
+"""
+ * The <code>PhaseStatistics</code> is a sample listener that
+ * summarizes the samples of each phase of a <code>DurationTest</code>
+ * separately: iteration count, throughput and latency histogram.
+"""
+
+from DurationTest import STEADY_STATE
+from Histogram import Histogram
+
+
+class PhaseStatistics:
+
+    def __init__(self, phases):
+        """
+         * Constructs a <code>PhaseStatistics</code>.
+         *
+         * @param phases List of <code>(name, duration)</code> pairs.
+        """
+        self.phases = phases
+        self.reset()
+
+    def reset(self):
+        self.histograms = dict((name, Histogram()) for name, duration in self.phases)
+
+    def __call__(self, sample):
+        histogram = self.histograms.get(sample.phase)
+        if histogram is not None:
+            histogram.recordValue(sample.elapsedTime)
+
+    def newShard(self):
+        return PhaseStatistics(self.phases)
+
+    def mergeShard(self, shard):
+        for name, histogram in shard.histograms.items():
+            self.histograms[name].add(histogram)
+
+    def getHistogram(self, phase):
+        """
+         * Returns the histogram of the iteration times of a phase.
+        """
+        return self.histograms[phase]
+
+    def getThroughput(self, phase):
+        """
+         * Returns the number of iterations completed per second
+         * during a phase, or <code>None</code> if it has no duration.
+        """
+        duration = dict(self.phases)[phase]
+        if not duration:
+            return None
+        return self.histograms[phase].getTotalCount() / float(duration)
+
+    def __str__(self):
+        lines = []
+        for name, duration in self.phases:
+            if not duration:
+                continue
+            histogram = self.histograms[name]
+            line = "%s: %d iterations in %g sec., %.2f/sec." % (
+                name, histogram.getTotalCount(), duration, self.getThroughput(name))
+            if histogram.getTotalCount():
+                line += ", p50 %s sec., p99 %s sec., max %s sec." % (
+                    histogram.getValueAtPercentile(50), histogram.getValueAtPercentile(99),
+                    histogram.getMax())
+            lines.append(line)
+        return "\n".join(lines)
+
+
+class SteadyStateListener:
+    """
+     * Passes only the samples of the steady-state phase
+     * on to another sample listener.
+    """
+
+    def __init__(self, listener):
+        self.listener = listener
+
+    def newShard(self):
+        newShard = getattr(self.listener, "newShard", None)
+        if newShard is None:
+            return None
+        return SteadyStateListener(newShard())
+
+    def mergeShard(self, shard):
+        self.listener.mergeShard(shard.listener)
+
+    def __call__(self, sample):
+        if sample.phase is None or sample.phase == STEADY_STATE:
+            self.listener(sample)
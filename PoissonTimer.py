@@ -0,0 +1,33 @@
+"""
+ * The <code>PoissonTimer</code> is a <code>Timer</code>
+ * with exponentially distributed delays, so that users are
+ * added as a Poisson process with the specified mean delay.
+ *
+ * @see Timer
+"""
+
+import random
+
+from CustomExceptions import IllegalArgumentException
+from Timer import Timer
+
+class PoissonTimer(Timer):
+
+	def __init__(self, meanDelay):
+		"""
+		 * Constructs a <code>PoissonTimer</code> with the
+		 * specified mean delay.
+		 *
+		 * @param meanDelay Mean delay (in milliseconds).
+		"""
+		if meanDelay <= 0:
+			raise IllegalArgumentException("Mean delay must be > 0")
+		self.meanDelay = meanDelay
+
+	def getDelay(self):
+		"""
+		 * Returns the timer delay.
+		 *
+		 * @return Delay (in milliseconds).
+		"""
+		return random.expovariate(1.0 / self.meanDelay)
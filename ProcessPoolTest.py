@@ -0,0 +1,170 @@
+"""
+ * The <code>ProcessPoolTest</code> is a test decorator that
+ * runs a test in a worker process of a process pool.
+ * <p>
+ * It is the process counterpart of <code>ThreadedTest</code>,
+ * used by a <code>LoadTest</code> constructed with
+ * <code>executor="process"</code> so that CPU-bound tests are
+ * not serialized by the global interpreter lock.  The decorated
+ * test is pickled into the worker process, which runs it and
+ * sends back its failures, errors, skips and samples.  These
+ * are then added to the test result and sample listeners of
+ * the parent process.
+ * </p>
+ * <p>
+ * The decorated test, and everything it references, must
+ * therefore be picklable, and its class importable by the
+ * worker processes.
+ * </p>
+"""
+
+from threading import Lock
+from unittest import TestResult
+
+from CustomExceptions import AssertionFailedError, RemoteTestError
+from Sample import publishSample, runSampled
+from Test import Test
+from ThreadBarrier import ThreadBarrier
+
+
+class ProcessPoolTest(Test):
+
+    def __init__(self, test, barrier=None):
+        """
+         * Constructs a <code>ProcessPoolTest</code> to decorate the
+         * specified test using the specified thread barrier.
+         *
+         * @param test Test to decorate.
+         * @param barrier Barrier signalled as each run completes.
+        """
+        self.test = test
+        self.barrier = barrier
+        if self.barrier is None:
+            self.barrier = ThreadBarrier(1)
+        self.executor = None
+        self.sampleListeners = []
+        self.lock = Lock()
+
+    def setExecutor(self, executor):
+        """
+         * Sets the <code>concurrent.futures</code> process pool
+         * executor in which the test is run.
+        """
+        self.executor = executor
+
+    def countTestCases(self):
+        return self.test.countTestCases()
+
+    def addSampleListener(self, listener):
+        """
+         * Registers a sample listener.  Listeners stay in the
+         * parent process and are passed the samples sent back
+         * by the worker processes.
+        """
+        self.sampleListeners.append(listener)
+        return True
+
+    def run(self, result, user=None):
+        """
+         * Submits the test to the process pool.  The outcome
+         * is added to the result as the run completes.
+         *
+         * @param result Test result.
+         * @param user <code>VirtualUser</code> the test runs for.
+        """
+        future = self.executor.submit(runInProcess, self.test, user)
+        future.add_done_callback(lambda f: self.onCompletion(f, result))
+
+    def onCompletion(self, future, result):
+        try:
+            with self.lock:
+                error = future.exception()
+                if error is not None:
+                    result.addError(self.getReportedTest(),
+                                    (RemoteTestError, RemoteTestError(repr(error)), None))
+                else:
+                    outcome = future.result()
+                    outcome.addTo(result, self.getReportedTest())
+                    for sample in outcome.samples:
+                        publishSample(self.sampleListeners, sample)
+        finally:
+            self.barrier.onCompletion(None)
+
+    def getReportedTest(self):
+        if hasattr(self.test, "failureException"):
+            return self.test
+        return self
+
+    def __str__(self):
+        return "ProcessPoolTest: " + str(self.test)
+
+
+class RemoteOutcome(TestResult):
+    """
+     * A picklable <code>TestResult</code> that keeps failures
+     * and errors as text, so that they can be sent back from
+     * a worker process.
+    """
+
+    def __init__(self):
+        TestResult.__init__(self)
+        self.remoteFailures = []
+        self.remoteErrors = []
+        self.remoteSkips = []
+        self.samples = []
+
+    def addFailure(self, test, err):
+        self.remoteFailures.append((str(test), self._exc_info_to_string(err, test)))
+
+    def addError(self, test, err):
+        self.remoteErrors.append((str(test), self._exc_info_to_string(err, test)))
+
+    def addSkip(self, test, reason):
+        self.remoteSkips.append(reason)
+
+    def __getstate__(self):
+        return {"testsRun": self.testsRun,
+                "remoteFailures": self.remoteFailures,
+                "remoteErrors": self.remoteErrors,
+                "remoteSkips": self.remoteSkips,
+                "samples": self.samples}
+
+    def __setstate__(self, state):
+        TestResult.__init__(self)
+        self.__dict__.update(state)
+
+    def addTo(self, result, test):
+        """
+         * Adds the outcome to a test result of the parent process.
+        """
+        result.testsRun += self.testsRun
+        for description, text in self.remoteFailures:
+            result.addFailure(test, (AssertionFailedError,
+                                     AssertionFailedError(description + "\n" + text), None))
+        for description, text in self.remoteErrors:
+            result.addError(test, (RemoteTestError,
+                                   RemoteTestError(description + "\n" + text), None))
+        for reason in self.remoteSkips:
+            result.addSkip(test, reason)
+
+
+def runInProcess(test, user=None):
+    """
+     * Runs a test in a worker process and returns its
+     * <code>RemoteOutcome</code>.
+    """
+    outcome = RemoteOutcome()
+    sampled = isinstance(test, Test) and test.addSampleListener(outcome.samples.append)
+    if user is not None:
+        with user:
+            runRemoteTest(test, outcome, sampled)
+    else:
+        runRemoteTest(test, outcome, sampled)
+    return outcome
+
+
+def runRemoteTest(test, outcome, sampled):
+    if sampled:
+        test.run(outcome)
+    else:
+        runSampled(test, outcome, [outcome.samples.append])
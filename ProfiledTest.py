@@ -0,0 +1,232 @@
+"""
+ * The <code>ProfiledTest</code> is a test decorator that samples
+ * the stacks of the threads running its decorated test, so that a
+ * failed performance test explains where the time went.
+ * <p>
+ * While the decorated test runs, a sampling thread takes the stack
+ * of every thread at a fixed interval, with
+ * <code>sys._current_frames()</code>, and keeps only references to
+ * their code objects, which is cheap enough to leave on in routine
+ * performance runs.  Afterwards, the stacks of the threads that ran
+ * iterations of the decorated test, such as the users of a
+ * <code>LoadTest</code> or the repetitions of a
+ * <code>RepeatedTest</code>, are aggregated.  The stacks taken during
+ * the slowest iterations are also aggregated separately, by matching
+ * the thread and time span of each iteration sample.
+ * </p>
+ * <p>
+ * Both aggregates can be written as collapsed stacks, one line
+ * per distinct stack with its count, which flame graph tools read.
+ * When the decorated test fails, a summary of the functions most
+ * often found on the stacks, overall and during the slowest
+ * iterations, is appended to its failures and errors.
+ * </p>
+ * <p>
+ * For example, to profile a timed load test and write its stacks:
+ * <blockquote>
+ * <pre>
+ * profiledTest = ProfiledTest(TimedTest(loadTest, 10), outputPath="load.folded")
+ * </pre>
+ * </blockquote>
+ * Users run in worker processes, or by agents, are not sampled.
+ * </p>
+"""
+
+import os
+import sys
+import threading
+import time
+
+from CustomExceptions import IllegalArgumentException
+from TestDecorator import TestDecorator
+
+
+class ProfiledTest(TestDecorator):
+
+    def __init__(self, test, interval=0.01, slowest=5, outputPath=None, slowestOutputPath=None,
+                 topFunctions=10, maxStacks=1000000):
+        """
+         * Constructs a <code>ProfiledTest</code> to decorate the
+         * specified test.
+         *
+         * @param test Test to decorate.
+         * @param interval Interval (sec.) between stack samples.
+         * @param slowest Number of slowest iterations whose stacks
+         *        are aggregated separately.
+         * @param outputPath Path of the collapsed stacks of all
+         *        iterations, or <code>None</code>.
+         * @param slowestOutputPath Path of the collapsed stacks of
+         *        the slowest iterations, or <code>None</code>.
+         * @param topFunctions Number of functions in the summary.
+         * @param maxStacks Maximum number of stacks kept per run.
+        """
+        TestDecorator.__init__(self, test)
+        if interval <= 0:
+            raise IllegalArgumentException("Sampling interval must be > 0")
+        self.interval = interval
+        self.slowest = slowest
+        self.outputPath = outputPath
+        self.slowestOutputPath = slowestOutputPath
+        self.topFunctions = topFunctions
+        self.maxStacks = maxStacks
+        self.lock = threading.Lock()
+        self.iterations = []
+        self.stacks = []
+        self.isSampled = TestDecorator.addSampleListener(self, self.onSample)
+
+    def countTestCases(self):
+        return TestDecorator.countTestCases(self)
+
+    def onSample(self, sample):
+        with self.lock:
+            self.iterations.append((sample.threadId, sample.beginTime, sample.elapsedTime))
+
+    def run(self, result):
+        with self.lock:
+            self.iterations = []
+        self.stacks = []
+        firstFailure, firstError = len(result.failures), len(result.errors)
+        stopped = threading.Event()
+        sampler = threading.Thread(target=self.sampleStacks, args=(stopped,), name="ProfiledTest sampler")
+        sampler.daemon = True
+        beginTime = time.time()
+        sampler.start()
+        try:
+            TestDecorator.run(self, result)
+        finally:
+            stopped.set()
+            sampler.join()
+        if not self.isSampled:
+            self.iterations.append((threading.get_ident(), beginTime, time.time() - beginTime))
+        self.writeCollapsedStacks(self.outputPath, self.getCollapsedStacks())
+        self.writeCollapsedStacks(self.slowestOutputPath, self.getCollapsedStacks(slowest=True))
+        if len(result.failures) > firstFailure or len(result.errors) > firstError:
+            self.appendSummary(result, firstFailure, firstError)
+
+    def __call__(self, result):
+        self.run(result)
+
+    def sampleStacks(self, stopped):
+        samplerId = threading.get_ident()
+        stacks = self.stacks
+        while not stopped.wait(self.interval):
+            now = time.time()
+            for threadId, frame in sys._current_frames().items():
+                if threadId == samplerId:
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                stacks.append((now, threadId, tuple(codes)))
+            if len(stacks) >= self.maxStacks:
+                return
+
+    def getSlowestIterations(self):
+        """
+         * Returns the <code>(threadId, beginTime, elapsedTime)</code>
+         * of the slowest iterations of the last run.
+        """
+        return sorted(self.iterations, key=lambda iteration: -iteration[2])[:self.slowest]
+
+    def getStacks(self, slowest=False):
+        """
+         * Returns the stacks, as tuples of code objects from the
+         * innermost frame, taken from the threads that ran
+         * iterations, or only during the slowest iterations.
+        """
+        if slowest:
+            spans = {}
+            for threadId, beginTime, elapsedTime in self.getSlowestIterations():
+                spans.setdefault(threadId, []).append((beginTime, beginTime + elapsedTime))
+            return [codes for now, threadId, codes in self.stacks
+                    if any(begin <= now <= end for begin, end in spans.get(threadId, ()))]
+        threadIds = set(iteration[0] for iteration in self.iterations)
+        return [codes for now, threadId, codes in self.stacks if threadId in threadIds]
+
+    def getCollapsedStacks(self, slowest=False):
+        """
+         * Returns a dictionary mapping collapsed stacks, from the
+         * outermost frame and separated by semicolons, to their
+         * number of samples.
+        """
+        collapsed = {}
+        names = {}
+        for codes in self.getStacks(slowest):
+            key = ";".join(getFunctionName(code, names) for code in reversed(codes))
+            collapsed[key] = collapsed.get(key, 0) + 1
+        return collapsed
+
+    def getTopFunctions(self, slowest=False):
+        """
+         * Returns the <code>(function, selfCount, totalCount,
+         * stackCount)</code> of the functions most often at the top
+         * of the stacks, then most often anywhere on them.
+        """
+        selfCounts = {}
+        totalCounts = {}
+        names = {}
+        stacks = self.getStacks(slowest)
+        for codes in stacks:
+            if not codes:
+                continue
+            leaf = getFunctionName(codes[0], names)
+            selfCounts[leaf] = selfCounts.get(leaf, 0) + 1
+            for name in set(getFunctionName(code, names) for code in codes):
+                totalCounts[name] = totalCounts.get(name, 0) + 1
+        top = sorted(totalCounts, key=lambda name: (-selfCounts.get(name, 0), -totalCounts[name]))
+        return [(name, selfCounts.get(name, 0), totalCounts[name], len(stacks))
+                for name in top[:self.topFunctions]]
+
+    def getSummary(self):
+        """
+         * Returns the summary of the top functions of the last
+         * run, overall and during its slowest iterations.
+        """
+        summary = ""
+        for title, slowest in (("all iterations", False),
+                               ("the " + str(self.slowest) + " slowest iterations", True)):
+            top = self.getTopFunctions(slowest)
+            if not top:
+                continue
+            summary += "\n\nTop functions during " + title + " (" + str(top[0][3]) + " stack samples):\n"
+            summary += "  self%   total%  function\n"
+            for name, selfCount, totalCount, stackCount in top:
+                summary += "%6.1f%% %7.1f%%  %s\n" % (100.0 * selfCount / stackCount,
+                                                     100.0 * totalCount / stackCount, name)
+        return summary
+
+    def appendSummary(self, result, firstFailure, firstError):
+        """
+         * Appends the summary to the failures and errors from the
+         * specified indices on, which are those of the last run.
+        """
+        summary = self.getSummary()
+        if not summary:
+            return
+        for problems, first in ((result.failures, firstFailure), (result.errors, firstError)):
+            for i in range(first, len(problems)):
+                test, text = problems[i]
+                if not text.endswith(summary):
+                    problems[i] = (test, text + summary)
+
+    def writeCollapsedStacks(self, path, collapsed):
+        if path is None:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            for stack in sorted(collapsed):
+                f.write(stack + " " + str(collapsed[stack]) + "\n")
+
+    def __str__(self):
+        return "ProfiledTest: " + str(self.test)
+
+
+def getFunctionName(code, names):
+    name = names.get(code)
+    if name is None:
+        name = names[code] = "%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename),
+                                             code.co_firstlineno)
+    return name
@@ -0,0 +1,35 @@
+"""
+ * The <code>RandomTimer</code> is a <code>Timer</code>
+ * with a random delay and a uniformly distributed variation.
+ *
+ * @see Timer
+"""
+
+import random
+
+from CustomExceptions import IllegalArgumentException
+from Timer import Timer
+
+class RandomTimer(Timer):
+
+	def __init__(self, delay, variation):
+		"""
+		 * Constructs a <code>RandomTimer</code> with the
+		 * specified minimum delay and variation.
+		 *
+		 * @param delay Minimum delay (in milliseconds).
+		 * @param variation Maximum variation added to the
+		 *        minimum delay (in milliseconds).
+		"""
+		if delay < 0 or variation < 0:
+			raise IllegalArgumentException("Delay and variation must be >= 0")
+		self.delay = delay
+		self.variation = variation
+
+	def getDelay(self):
+		"""
+		 * Returns the timer delay.
+		 *
+		 * @return Delay (in milliseconds).
+		"""
+		return self.delay + random.random() * self.variation
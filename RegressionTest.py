@@ -0,0 +1,206 @@
+"""
+ * The <code>RegressionTest</code> is a test decorator that
+ * compares the distribution of the iteration times of its
+ * decorated test against a stored baseline.
+ * <p>
+ * Rather than failing against a single hard-coded maximum time,
+ * which is either flaky or too loose on shared hardware, a
+ * <code>RegressionTest</code> fails only when the iteration times
+ * are significantly slower than those of the baseline according
+ * to a one-sided Mann-Whitney U test, and the median slowdown is
+ * at least a configured effect size.  Baselines are kept in a JSON
+ * file, keyed by the name of the decorated test.  The first run of
+ * a test without a baseline records one.
+ * </p>
+ * <p>
+ * The decorated test should produce several samples per run, as
+ * a <code>LoadTest</code> or a <code>RepeatedTest</code> does.  For
+ * example, to fail when the iterations are at least 10% slower than
+ * the baseline, at a significance level of 1%, use:
+ * <blockquote>
+ * <pre>
+ * loadTest = LoadTest(ExampleTest("testSomething"), 10, 20)
+ * regressionTest = RegressionTest(loadTest, "baselines.json", 0.01, 0.1)
+ * </pre>
+ * </blockquote>
+ * </p>
+"""
+
+import json
+import math
+import os
+import random
+import sys
+from statistics import median
+from threading import Lock
+
+from CustomExceptions import AssertionFailedError, IllegalArgumentException
+from Sample import runSampled
+from TestDecorator import TestDecorator
+
+
+class RegressionTest(TestDecorator):
+
+    def __init__(self, test, baselinePath, alpha=0.01, minEffect=0.05, maxSamples=5000):
+        """
+         * Constructs a <code>RegressionTest</code>.
+         *
+         * @param test Test to decorate.
+         * @param baselinePath Path of the JSON file holding the baselines.
+         * @param alpha Significance level of the Mann-Whitney U test.
+         * @param minEffect Minimum relative slowdown of the median
+         *        iteration time for the test to fail (0.05 is 5%).
+         * @param maxSamples Maximum number of iteration times kept
+         *        per run, by reservoir sampling.
+        """
+        TestDecorator.__init__(self, test)
+        if alpha <= 0 or alpha >= 1:
+            raise IllegalArgumentException("Significance level must be between 0 and 1")
+        if maxSamples < 2:
+            raise IllegalArgumentException("At least 2 samples must be kept")
+        self.store = BaselineStore(baselinePath)
+        self.alpha = alpha
+        self.minEffect = minEffect
+        self.maxSamples = maxSamples
+        self.updateBaseline = False
+        self.isQuiet = False
+        self.lock = Lock()
+        self.samples = []
+        self.sampleCount = 0
+        self.isSampled = TestDecorator.addSampleListener(self, self.onSample)
+
+    def setUpdateBaseline(self):
+        """
+         * Replaces the stored baseline with the iteration times of
+         * the next run, if it passes.
+        """
+        self.updateBaseline = True
+
+    def setQuiet(self):
+        """
+         * Disables the output of the comparison.
+        """
+        self.isQuiet = True
+
+    def onSample(self, sample):
+        with self.lock:
+            self.sampleCount += 1
+            if len(self.samples) < self.maxSamples:
+                self.samples.append(sample.elapsedTime)
+            else:
+                i = random.randrange(self.sampleCount)
+                if i < self.maxSamples:
+                    self.samples[i] = sample.elapsedTime
+
+    def getSamples(self):
+        return list(self.samples)
+
+    def run(self, result):
+        self.samples = []
+        self.sampleCount = 0
+        problemCount = len(result.failures) + len(result.errors)
+        if self.isSampled:
+            TestDecorator.run(self, result)
+        else:
+            self.runUnsampled(result)
+
+        key = str(self.test)
+        baseline = self.store.get(key)
+        if baseline is None or self.updateBaseline:
+            if baseline is None or len(result.failures) + len(result.errors) == problemCount:
+                self.store.put(key, self.samples)
+            self.printComparison("baseline recorded (" + str(len(self.samples)) + " samples)")
+            return
+        self.compare(result, baseline, self.samples)
+
+    def runUnsampled(self, result):
+        runSampled(self.test, result, [self.onSample])
+
+    def compare(self, result, baseline, samples):
+        """
+         * Signals a failure if the samples are significantly
+         * slower than the baseline.
+        """
+        if len(samples) < 2 or len(baseline) < 2:
+            self.printComparison("too few samples to compare")
+            return
+        pValue = mannWhitneyPValue(baseline, samples)
+        baselineMedian = median(baseline)
+        currentMedian = median(samples)
+        effect = currentMedian / baselineMedian - 1 if baselineMedian else 0.0
+        summary = ("median " + str(currentMedian) + " sec. vs. baseline " + str(baselineMedian) +
+                   " sec. (" + "%+.1f%%" % (effect * 100) + ", p=" + "%.3g" % pValue + ")")
+        self.printComparison(summary)
+        if pValue < self.alpha and effect >= self.minEffect:
+            result.addFailure(self.getTest(),
+                              (AssertionFailedError,
+                               AssertionFailedError("Significant slowdown against baseline! " + summary), None))
+
+    def printComparison(self, summary):
+        if not self.isQuiet:
+            sys.stdout.write(str(self) + ": " + summary + "\n")
+            sys.stdout.flush()
+
+    def __str__(self):
+        return "RegressionTest: " + str(self.test)
+
+
+class BaselineStore:
+    """
+     * Keeps baseline iteration times in a JSON file.
+    """
+
+    lock = Lock()
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def get(self, key):
+        with BaselineStore.lock:
+            return self.load().get(key)
+
+    def put(self, key, samples):
+        with BaselineStore.lock:
+            baselines = self.load()
+            baselines[key] = samples
+            with open(self.path + ".tmp", "w") as f:
+                json.dump(baselines, f)
+            os.replace(self.path + ".tmp", self.path)
+
+
+def mannWhitneyPValue(baseline, samples):
+    """
+     * Returns the p-value of a one-sided Mann-Whitney U test of
+     * the hypothesis that the samples tend to be larger than the
+     * baseline, using the normal approximation with tie correction.
+    """
+    combined = sorted([(value, 0) for value in baseline] + [(value, 1) for value in samples])
+    n1, n2 = len(baseline), len(samples)
+    n = n1 + n2
+    rankSum = 0.0
+    tieCorrection = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        rank = (i + j) / 2.0 + 1
+        ties = j - i + 1
+        tieCorrection += ties ** 3 - ties
+        for k in range(i, j + 1):
+            if combined[k][1]:
+                rankSum += rank
+        i = j + 1
+    u = rankSum - n2 * (n2 + 1) / 2.0
+    mean = n1 * n2 / 2.0
+    variance = n1 * n2 / 12.0 * ((n + 1) - tieCorrection / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - mean - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
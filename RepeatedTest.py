@@ -1,34 +1,244 @@
 """
  * A Decorator that runs a test repeatedly.
+ * <p>
+ * A number of warm-up repetitions can be run first, to fill
+ * caches and perform lazy initialization; they are neither
+ * timed nor sampled.  Instead of a fixed repetition count, the
+ * count can be calibrated, as <code>timeit</code> does, so that
+ * the measured repetitions last at least a target time:
+ * <blockquote>
+ * <pre>
+ * repeatedTest = RepeatedTest(ExampleTest("testSomething"), 0, warmUp=5)
+ * repeatedTest.setAutorange(0.5)
+ * </pre>
+ * </blockquote>
+ * or extended until the confidence interval of the mean (or
+ * median) repetition time is narrower than a relative width:
+ * <blockquote>
+ * <pre>
+ * repeatedTest = RepeatedTest(ExampleTest("testSomething"), 10)
+ * repeatedTest.setTargetPrecision(0.05)
+ * </pre>
+ * </blockquote>
+ * </p>
  *
  **************************************
  * Ported to Python by Grig Gheorghiu *
  **************************************
 """
 
+import math
+import time
+from statistics import NormalDist
+
+from Cancellation import Cancellation
+from CustomExceptions import IllegalArgumentException
+from Sample import runSampled
 from TestDecorator import TestDecorator
+from VirtualUser import VirtualUser
 
 class RepeatedTest(TestDecorator):
-    
-    def __init__(self, test, repeat):
+
+    def __init__(self, test, repeat, warmUp=0):
         TestDecorator.__init__(self, test)
         if (repeat < 0):
             raise IllegalArgumentException("Repetition count must be > 0")
+        if (warmUp < 0):
+            raise IllegalArgumentException("Warm-up count must be >= 0")
         self.test = test
         self.repeat = repeat
-        
+        self.warmUp = warmUp
+        self.autorangeTime = None
+        self.relativeWidth = None
+        self.sampleListeners = []
+        self.lastRepeat = None
+
+    def setAutorange(self, targetTime=0.2):
+        """
+         * Calibrates the repetition count before each run: the
+         * test is run 1, 2, 5, 10, 20, 50, ... times until that
+         * many repetitions take at least the target time, and that
+         * count is then used.  The calibration runs are discarded.
+         *
+         * @param targetTime Minimum duration (sec.) of the measured
+         *        repetitions.
+        """
+        if targetTime <= 0:
+            raise IllegalArgumentException("Target time must be > 0")
+        self.autorangeTime = targetTime
+
+    def setTargetPrecision(self, relativeWidth, confidence=0.95, statistic="mean", maxRepeat=100000):
+        """
+         * Keeps repeating the test, beyond the repetition count,
+         * until the confidence interval of the repetition time is
+         * narrower than the specified fraction of its estimate.
+         *
+         * @param relativeWidth Maximum width of the confidence
+         *        interval, relative to the estimate (0.05 is 5%).
+         * @param confidence Confidence level of the interval.
+         * @param statistic <code>"mean"</code> or <code>"median"</code>.
+         * @param maxRepeat Maximum number of repetitions.
+        """
+        if relativeWidth <= 0:
+            raise IllegalArgumentException("Relative width must be > 0")
+        if confidence <= 0 or confidence >= 1:
+            raise IllegalArgumentException("Confidence must be between 0 and 1")
+        if statistic not in ("mean", "median"):
+            raise IllegalArgumentException("Statistic must be 'mean' or 'median'")
+        self.relativeWidth = relativeWidth
+        self.confidence = confidence
+        self.statistic = statistic
+        self.maxRepeat = maxRepeat
+
     def countTestCases(self):
-        return self.timesRepeat * TestDecorator.countTestCases(self)
-    
+        return (self.warmUp + self.repeat) * TestDecorator.countTestCases(self)
+
+    def addSampleListener(self, listener):
+        """
+         * Registers a sample listener.  Each repetition is
+         * recorded as a sample, unless the decorated test
+         * produces finer grained samples itself.
+        """
+        if not TestDecorator.addSampleListener(self, listener):
+            self.sampleListeners.append(listener)
+        return True
+
+    def getLastRepeat(self):
+        """
+         * Returns the number of repetitions measured by the
+         * last run, once calibrated or extended.
+        """
+        return self.lastRepeat
+
     def run(self, result):
-        for i in range(self.repeat):
+        for i in range(self.warmUp):
+            if self.shouldStop():
+                return
+            TestDecorator.run(self, result)
+        repeat = self.repeat
+        if self.autorangeTime is not None:
+            repeat = self.autorange(result)
+        times = []
+        for i in range(repeat):
             #if result.shouldStop():
             #    break
+            if self.shouldStop():
+                break
+            times.append(self.runRepetition(result))
+        if self.relativeWidth is not None:
+            self.extendToTargetPrecision(result, times)
+        self.lastRepeat = len(times)
+
+    def extendToTargetPrecision(self, result, times):
+        """
+         * Repeats the test until the confidence interval of the
+         * repetition time is narrow enough.  The mean and variance
+         * are kept as running moments, so that the interval of the
+         * mean is checked after every repetition at a constant
+         * cost.  The interval of the median needs the times in
+         * order, and is only checked each time the number of
+         * repetitions has grown by a tenth.
+        """
+        z = NormalDist().inv_cdf((1 + self.confidence) / 2.0)
+        moments = RunningMoments(times)
+        nextCheck = len(times)
+        while len(times) < self.maxRepeat and not self.shouldStop():
+            if self.statistic == "mean":
+                if moments.getIntervalWidth(z) <= self.relativeWidth:
+                    return
+            elif len(times) >= nextCheck:
+                if self.getMedianIntervalWidth(times, z) <= self.relativeWidth:
+                    return
+                nextCheck = max(len(times) + 1, int(len(times) * 1.1))
+            elapsedTime = self.runRepetition(result)
+            times.append(elapsedTime)
+            moments.add(elapsedTime)
+
+    def shouldStop(self):
+        return VirtualUser.isCurrentRetired() or Cancellation.isCurrentCancelled()
+
+    def autorange(self, result):
+        """
+         * Returns the smallest of 1, 2, 5, 10, 20, 50, ...
+         * repetitions lasting at least the autorange time.
+        """
+        i = 1
+        while True:
+            for number in (i, 2 * i, 5 * i):
+                start = time.perf_counter()
+                for j in range(number):
+                    if self.shouldStop():
+                        return 0
+                    TestDecorator.run(self, result)
+                if time.perf_counter() - start >= self.autorangeTime:
+                    return number
+            i *= 10
+
+    def runRepetition(self, result):
+        """
+         * Runs the test once and returns its elapsed time, or
+         * <code>None</code> if the time is not needed.
+        """
+        if self.sampleListeners:
+            return runSampled(self.test, result, self.sampleListeners).elapsedTime
+        if self.relativeWidth is None:
             TestDecorator.run(self, result)
-            
+            return None
+        start = time.perf_counter()
+        TestDecorator.run(self, result)
+        return time.perf_counter() - start
+
+    def getMedianIntervalWidth(self, times, z):
+        """
+         * Returns the width of the distribution-free confidence
+         * interval of the median of the specified times, relative
+         * to that median.
+        """
+        n = len(times)
+        if n < 3:
+            return float("inf")
+        ordered = sorted(times)
+        lower = int(math.floor(n / 2.0 - z * math.sqrt(n) / 2.0))
+        upper = int(math.ceil(n / 2.0 + z * math.sqrt(n) / 2.0))
+        if lower < 0 or upper >= n:
+            return float("inf")
+        median = ordered[n // 2]
+        if median <= 0:
+            return float("inf")
+        return (ordered[upper] - ordered[lower]) / median
+
     def __call__(self, result):
         self.run(result)
 
     def __str__(self):
         return str(self.test) + "(repeated)"
-    
\ No newline at end of file
+
+
+class RunningMoments:
+    """
+     * The running mean and variance of a series of times,
+     * updated with Welford's algorithm.
+    """
+
+    def __init__(self, times=()):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        for t in times:
+            self.add(t)
+
+    def add(self, t):
+        self.count += 1
+        delta = t - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (t - self.mean)
+
+    def getIntervalWidth(self, z):
+        """
+         * Returns the width of the confidence interval of the
+         * mean, relative to the mean.
+        """
+        if self.count < 3 or self.mean <= 0:
+            return float("inf")
+        variance = self.m2 / (self.count - 1)
+        return 2 * z * math.sqrt(variance / self.count) / self.mean
@@ -0,0 +1,140 @@
+"""
+ * A <code>ResultShard</code> collects the outcomes and samples of
+ * the tests run by one user of a load test, to be merged into the
+ * shared test result in batches and once all users have completed.
+ * <p>
+ * Without shards, the threads of every user report to the single
+ * <code>TestResult</code> passed to <code>LoadTest.run()</code>,
+ * and to the same sample listeners, which then become points of
+ * contention.  A shard instead records the calls made to it in
+ * the order they were made, under a lock of its own that only its
+ * user takes while running, and replays them into the test result
+ * every <code>FLUSH_CALLS</code> calls, under a lock shared by the
+ * shards of that result.  A failure or an error is replayed at
+ * once, so that the shard does not keep its traceback alive, and
+ * a long run only keeps a bounded number of calls.  Sample
+ * listeners that implement:
+ * <blockquote>
+ * <pre>
+ * newShard()           returns an empty listener of the same kind
+ * mergeShard(shard)    adds the contents of such a listener
+ * </pre>
+ * </blockquote>
+ * such as <code>Histogram</code>, are likewise replaced by a private
+ * copy for the duration of the run.  Other listeners are called
+ * directly and must be thread-safe.
+ * </p>
+ * <p>
+ * The calls left in the shards when all users have completed are
+ * merged in the order the users were started.  A shard merged while
+ * its user is still running, as happens when a load test is
+ * cancelled, forwards any later calls to the result.
+ * </p>
+"""
+
+from contextvars import ContextVar
+from threading import Lock
+
+currentShard = ContextVar("currentShard", default=None)
+
+RECORDED_METHODS = ("startTest", "stopTest", "addSuccess", "addFailure", "addError",
+                    "addSkip", "addExpectedFailure", "addUnexpectedSuccess",
+                    "addSubTest", "addDuration")
+FLUSH_CALLS = 1000
+
+
+class ResultShard:
+
+    def __init__(self, result, resultLock=None):
+        """
+         * Constructs a <code>ResultShard</code> of a test result.
+         *
+         * @param result Test result the shard is merged into.
+         * @param resultLock Lock shared by the shards of the test
+         *        result, held while calls are replayed into it.
+        """
+        self.__dict__["result"] = result
+        self.__dict__["resultLock"] = resultLock or Lock()
+        self.__dict__["calls"] = []
+        self.__dict__["listeners"] = {}
+        self.__dict__["merged"] = False
+        self.__dict__["lock"] = Lock()
+
+    def record(self, name, args):
+        with self.lock:
+            if self.merged:
+                calls = [(name, args)]
+            else:
+                self.calls.append((name, args))
+                if len(self.calls) < FLUSH_CALLS and name not in ("addFailure", "addError"):
+                    return
+                calls, self.__dict__["calls"] = self.calls, []
+        self.replay(calls)
+
+    def replay(self, calls):
+        with self.resultLock:
+            for name, args in calls:
+                getattr(self.result, name)(*args)
+
+    def __getattr__(self, name):
+        if name in RECORDED_METHODS and hasattr(self.result, name):
+            return lambda *args: self.record(name, args)
+        return getattr(self.result, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.result, name, value)
+
+    def publish(self, listeners, sample):
+        """
+         * Passes a sample to the shard's copy of each listener
+         * that can be sharded, and to the other listeners.
+        """
+        for listener in listeners:
+            shardListener = self.getListener(listener)
+            if shardListener is None:
+                listener(sample)
+            else:
+                shardListener(sample)
+
+    def getListener(self, listener):
+        key = id(listener)
+        with self.lock:
+            if self.merged:
+                return None
+            entry = self.listeners.get(key)
+            if entry is None:
+                newShard = getattr(listener, "newShard", None)
+                entry = (listener, newShard() if newShard is not None else None)
+                self.listeners[key] = entry
+            return entry[1]
+
+    def merge(self):
+        """
+         * Replays the recorded calls into the test result and merges
+         * the listener copies into their listeners.  Later calls
+         * are forwarded to the test result directly.
+        """
+        with self.lock:
+            self.__dict__["merged"] = True
+            calls, self.__dict__["calls"] = self.calls, []
+            listeners, self.__dict__["listeners"] = self.listeners, {}
+        self.replay(calls)
+        for listener, shardListener in listeners.values():
+            if shardListener is not None:
+                listener.mergeShard(shardListener)
+
+    def __enter__(self):
+        self.__dict__["token"] = currentShard.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        currentShard.reset(self.token)
+        return False
+
+    @staticmethod
+    def current():
+        """
+         * Returns the <code>ResultShard</code> of the user being
+         * run, or <code>None</code>.
+        """
+        return currentShard.get()
@@ -0,0 +1,139 @@
+"""
+ * A <code>Sample</code> describes a single timed invocation
+ * of a decorated test.
+ * <p>
+ * Samples are produced by the decorators that invoke a test
+ * more than once, such as <code>RepeatedTest</code> and
+ * <code>LoadTest</code>, and are passed to every sample
+ * listener registered with <code>Test.addSampleListener()</code>.
+ * A sample listener is any callable accepting a <code>Sample</code>.
+ * </p>
+"""
+
+import threading
+import time
+
+from ResultShard import ResultShard
+from VirtualUser import VirtualUser
+
+SUCCESS = "success"
+FAILURE = "failure"
+ERROR = "error"
+SKIP = "skip"
+
+
+class Sample:
+
+    def __init__(self, beginTime, elapsedTime, userId=None, outcome=SUCCESS, errorType=None):
+        """
+         * Constructs a <code>Sample</code>.
+         *
+         * @param beginTime Wall clock time at which the invocation began.
+         * @param elapsedTime Elapsed time of the invocation (in seconds).
+         * @param userId Index of the virtual user that made the
+         *        invocation, or <code>None</code>.
+         * @param outcome One of <code>SUCCESS</code>, <code>FAILURE</code>,
+         *        <code>ERROR</code> or <code>SKIP</code>.
+         * @param errorType Name of the class of the exception that
+         *        caused a failure or error, or <code>None</code>.
+         * <p>
+         * The sample also notes the identifier of the thread that
+         * constructs it, normally the one that made the invocation.
+         * </p>
+        """
+        self.beginTime = beginTime
+        self.elapsedTime = elapsedTime
+        self.userId = userId
+        self.outcome = outcome
+        self.errorType = errorType
+        self.phase = None
+        self.threadId = threading.get_ident()
+
+    def __repr__(self):
+        return "Sample(beginTime=%r, elapsedTime=%r, userId=%r, outcome=%r)" % (
+            self.beginTime, self.elapsedTime, self.userId, self.outcome)
+
+
+class SampleResult:
+    """
+     * Forwards to a <code>TestResult</code>, noting the outcome
+     * of the tests run against it.
+    """
+
+    def __init__(self, result):
+        self.__dict__["result"] = result
+        self.__dict__["outcome"] = SUCCESS
+        self.__dict__["errorType"] = None
+
+    def note(self, outcome, err):
+        if self.outcome in (SUCCESS, SKIP):
+            self.__dict__["outcome"] = outcome
+            if err is not None:
+                self.__dict__["errorType"] = err[0].__name__
+
+    def addFailure(self, test, err):
+        self.note(FAILURE, err)
+        self.result.addFailure(test, err)
+
+    def addError(self, test, err):
+        self.note(ERROR, err)
+        self.result.addError(test, err)
+
+    def addSkip(self, test, reason):
+        if self.outcome == SUCCESS:
+            self.__dict__["outcome"] = SKIP
+        self.result.addSkip(test, reason)
+
+    def addSubTest(self, test, subtest, err):
+        if err is not None:
+            self.note(FAILURE if issubclass(err[0], test.failureException) else ERROR, err)
+        self.result.addSubTest(test, subtest, err)
+
+    def addUnexpectedSuccess(self, test):
+        self.note(FAILURE, None)
+        self.result.addUnexpectedSuccess(test)
+
+    def __getattr__(self, name):
+        return getattr(self.result, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.result, name, value)
+
+
+def getCurrentUserId():
+    user = VirtualUser.current()
+    if user is None:
+        return None
+    return user.userId
+
+
+def runSampled(test, result, listeners):
+    """
+     * Runs a test once, timing it, and passes the resulting
+     * <code>Sample</code> to each of the specified listeners.
+     *
+     * @return Sample.
+    """
+    sampleResult = SampleResult(result)
+    beginTime = time.time()
+    start = time.perf_counter()
+    test.run(sampleResult)
+    elapsedTime = time.perf_counter() - start
+    sample = Sample(beginTime, elapsedTime, getCurrentUserId(),
+                    sampleResult.outcome, sampleResult.errorType)
+    publishSample(listeners, sample)
+    return sample
+
+
+def publishSample(listeners, sample):
+    """
+     * Passes the sample to each of the specified listeners,
+     * or to their copies in the <code>ResultShard</code> of
+     * the user being run.
+    """
+    shard = ResultShard.current()
+    if shard is not None:
+        shard.publish(listeners, sample)
+        return
+    for listener in listeners:
+        listener(sample)
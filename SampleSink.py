@@ -0,0 +1,149 @@
+"""
+ * A <code>SampleSink</code> is a sample listener that streams
+ * every sample to a file, for offline analysis of long runs.
+ * <p>
+ * Samples are appended to a bounded in-memory buffer, and written
+ * to the file by a background thread, so that the threads running
+ * the test never wait for I/O.  If the buffer is full, because the
+ * file cannot be written as fast as samples are produced, further
+ * samples are dropped and counted rather than blocking the test.
+ * </p>
+ * <p>
+ * For example, to stream the samples of a load test to a
+ * JSON Lines file, use:
+ * <blockquote>
+ * <pre>
+ * sink = JsonLinesSampleSink("samples.jsonl")
+ * loadTest.addSampleListener(sink)
+ * ...
+ * sink.close()
+ * </pre>
+ * </blockquote>
+ * Each record holds the begin time (seconds since the epoch),
+ * user id, latency (seconds), outcome, exception class and phase
+ * of a sample.
+ * </p>
+"""
+
+import csv
+import json
+from collections import deque
+from threading import Event, Thread
+
+from CustomExceptions import IllegalArgumentException
+
+FIELDS = ("beginTime", "userId", "elapsedTime", "outcome", "errorType", "phase")
+
+
+class SampleSink:
+
+    def __init__(self, path, capacity=100000, flushInterval=0.5):
+        """
+         * Constructs a <code>SampleSink</code> and starts its
+         * flushing thread.
+         *
+         * @param path Path of the file to write.
+         * @param capacity Maximum number of samples buffered in memory.
+         * @param flushInterval Interval (sec.) at which buffered
+         *        samples are written to the file.
+        """
+        if capacity < 1:
+            raise IllegalArgumentException("Capacity must be > 0")
+        self.path = path
+        self.capacity = capacity
+        self.flushInterval = flushInterval
+        self.buffer = deque()
+        self.droppedCount = 0
+        self.writtenCount = 0
+        self.file = self.open(path)
+        self.closed = Event()
+        self.flusher = Thread(target=self.flushPeriodically, name="SampleSink:" + str(path))
+        self.flusher.daemon = True
+        self.flusher.start()
+
+    def open(self, path):
+        return open(path, "w", newline="")
+
+    def __call__(self, sample):
+        if len(self.buffer) >= self.capacity:
+            self.droppedCount += 1
+            return
+        self.buffer.append(sample)
+
+    def flushPeriodically(self):
+        while not self.closed.wait(self.flushInterval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        """
+         * Writes the buffered samples to the file.
+        """
+        buffer = self.buffer
+        written = 0
+        while buffer:
+            self.writeSample(buffer.popleft())
+            written += 1
+        if written:
+            self.file.flush()
+            self.writtenCount += written
+
+    def writeSample(self, sample):
+        """
+         * Writes one sample.  "Abstract" method
+        """
+        None
+
+    def getRecord(self, sample):
+        return [getattr(sample, field) for field in FIELDS]
+
+    def close(self):
+        """
+         * Writes the remaining samples and closes the file.
+        """
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        self.flusher.join()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def getDroppedCount(self):
+        """
+         * Returns the number of samples dropped because the
+         * buffer was full.
+        """
+        return self.droppedCount
+
+    def getWrittenCount(self):
+        return self.writtenCount
+
+
+class JsonLinesSampleSink(SampleSink):
+    """
+     * Writes each sample as a JSON object on a line of its own.
+    """
+
+    def writeSample(self, sample):
+        self.file.write(json.dumps(dict(zip(FIELDS, self.getRecord(sample)))) + "\n")
+
+
+class CsvSampleSink(SampleSink):
+    """
+     * Writes each sample as a row of a CSV file with a header row.
+    """
+
+    def open(self, path):
+        file = SampleSink.open(self, path)
+        self.writer = csv.writer(file)
+        self.writer.writerow(FIELDS)
+        return file
+
+    def writeSample(self, sample):
+        self.writer.writerow(self.getRecord(sample))
@@ -0,0 +1,220 @@
+"""
+ * The <code>ScalabilityTest</code> is a test that measures how the
+ * throughput of a <code>LoadTest</code> scales with its number of
+ * users, and fits the Universal Scalability Law to it.
+ * <p>
+ * The decorated test is run as load tests of 1, 2, 4, ... users, up
+ * to a maximum, and the throughput and latency of each level are
+ * recorded.  The throughputs are then fitted, by least squares, to
+ * the Universal Scalability Law:
+ * <blockquote>
+ * <pre>
+ * X(N) = X(1) N / (1 + sigma (N - 1) + kappa N (N - 1))
+ * </pre>
+ * </blockquote>
+ * where <code>sigma</code> is the contention coefficient, the serial
+ * fraction of Amdahl's law, and <code>kappa</code> the coherency
+ * coefficient, the cost of keeping users consistent with each other.
+ * With a coherency cost, throughput peaks at
+ * <code>N* = sqrt((1 - sigma) / kappa)</code> users and then
+ * declines.  A <code>ScalabilityTest</code> fails when that peak is
+ * below a target number of users, which reveals added contention
+ * long before a load test at a single number of users slows down.
+ * </p>
+ * <p>
+ * For example, to sweep up to 64 users for 10 seconds per level
+ * and require throughput to keep scaling up to 32 users, use:
+ * <blockquote>
+ * <pre>
+ * scalabilityTest = ScalabilityTest(ExampleTest("testSomething"), 64,
+ *                                   targetConcurrency=32, duration=10)
+ * </pre>
+ * </blockquote>
+ * </p>
+"""
+
+import math
+import sys
+import time
+
+from CustomExceptions import AssertionFailedError, IllegalArgumentException
+from DurationTest import STEADY_STATE
+from Histogram import Histogram
+from LoadTest import LoadTest
+from Test import Test
+
+
+class ScalabilityTest(Test):
+
+    def __init__(self, test, maxUsers, targetConcurrency=None, **loadTestOptions):
+        """
+         * Constructs a <code>ScalabilityTest</code>.
+         *
+         * @param test Test decorated by the load tests.
+         * @param maxUsers Largest number of users.
+         * @param targetConcurrency Number of users below which the
+         *        peak of the fitted throughput fails this test, or
+         *        <code>None</code>.
+         * @param loadTestOptions Keyword arguments of the load tests,
+         *        such as <code>iterations</code> or <code>duration</code>.
+        """
+        if maxUsers < 1:
+            raise IllegalArgumentException("Maximum number of users must be > 0")
+        self.test = test
+        self.maxUsers = maxUsers
+        self.targetConcurrency = targetConcurrency
+        self.loadTestOptions = loadTestOptions
+        self.isQuiet = False
+        self.levels = []
+        self.sigma = None
+        self.kappa = None
+
+    def setQuiet(self):
+        """
+         * Disables the output of the levels and the fit.
+        """
+        self.isQuiet = True
+
+    def countTestCases(self):
+        return sum(self.getUserCounts()) * self.test.countTestCases()
+
+    def getUserCounts(self):
+        """
+         * Returns the numbers of users of the sweep: the powers
+         * of 2 up to the maximum, and the maximum.
+        """
+        users = []
+        n = 1
+        while n < self.maxUsers:
+            users.append(n)
+            n *= 2
+        users.append(self.maxUsers)
+        return users
+
+    def run(self, result):
+        self.levels = []
+        for users in self.getUserCounts():
+            self.levels.append(self.runLevel(users, result))
+        self.fit()
+        self.printLevels()
+        peak = self.getPeakConcurrency()
+        if self.targetConcurrency is not None and peak is not None and peak < self.targetConcurrency:
+            result.addFailure(self, (AssertionFailedError,
+                                     AssertionFailedError("Throughput peaks below the target concurrency! "
+                                                          "Expected at least " + str(self.targetConcurrency) +
+                                                          " users, but peaks at " + "%.1f" % peak +
+                                                          " users (sigma=%.4f, kappa=%.6f)" %
+                                                          (self.sigma, self.kappa)), None))
+
+    def __call__(self, result):
+        self.run(result)
+
+    def runLevel(self, users, result):
+        """
+         * Runs a load test with a number of users and returns
+         * its <code>(users, throughput, histogram)</code>.
+        """
+        loadTest = LoadTest(self.test, users, **self.loadTestOptions)
+        loadTest.setQuiet()
+        histogram = Histogram()
+        loadTest.addSampleListener(histogram)
+        start = time.perf_counter()
+        with loadTest:
+            loadTest.run(result)
+        elapsedTime = time.perf_counter() - start
+        phaseStatistics = loadTest.getPhaseStatistics()
+        if phaseStatistics is not None:
+            throughput = phaseStatistics.getThroughput(STEADY_STATE)
+        else:
+            throughput = histogram.getTotalCount() / elapsedTime
+        return users, throughput, histogram
+
+    def fit(self):
+        """
+         * Fits the contention and coherency coefficients to the
+         * throughputs of the last sweep, linearized as
+         * <code>N / C(N) - 1 = sigma (N - 1) + kappa N (N - 1)</code>
+         * where <code>C(N) = X(N) / X(1)</code>.  If the coherency
+         * coefficient comes out negative, Amdahl's law is fitted.
+        """
+        self.sigma = self.kappa = None
+        baseline = self.levels[0][1]
+        if len(self.levels) < 2 or not baseline:
+            return
+        points = []
+        for users, throughput, histogram in self.levels[1:]:
+            if throughput:
+                points.append((users - 1.0, users * (users - 1.0), users * baseline / throughput - 1))
+        if not points:
+            return
+        s11 = sum(a * a for a, b, y in points)
+        s12 = sum(a * b for a, b, y in points)
+        s22 = sum(b * b for a, b, y in points)
+        s1y = sum(a * y for a, b, y in points)
+        s2y = sum(b * y for a, b, y in points)
+        determinant = s11 * s22 - s12 * s12
+        sigma = kappa = None
+        if len(points) >= 2 and determinant > 0:
+            sigma = (s1y * s22 - s2y * s12) / determinant
+            kappa = (s11 * s2y - s12 * s1y) / determinant
+        if kappa is None or kappa < 0:
+            sigma, kappa = s1y / s11, 0.0
+        if sigma < 0:
+            sigma = 0.0
+            kappa = max(0.0, s2y / s22)
+        self.sigma, self.kappa = min(sigma, 1.0), kappa
+
+    def getCoefficients(self):
+        """
+         * Returns the fitted <code>(sigma, kappa)</code>.
+        """
+        return self.sigma, self.kappa
+
+    def getPeakConcurrency(self):
+        """
+         * Returns the number of users (at least 1) at which the
+         * fitted throughput peaks, or infinity if it never declines.
+        """
+        if self.sigma is None:
+            return None
+        if self.kappa <= 0:
+            return float("inf")
+        return max(1.0, math.sqrt((1 - self.sigma) / self.kappa))
+
+    def getPredictedThroughput(self, users):
+        """
+         * Returns the throughput predicted by the fit.
+        """
+        if self.sigma is None:
+            return None
+        return (self.levels[0][1] * users /
+                (1 + self.sigma * (users - 1) + self.kappa * users * (users - 1)))
+
+    def getLevels(self):
+        """
+         * Returns the <code>(users, throughput, histogram)</code>
+         * of each level of the last sweep.
+        """
+        return self.levels
+
+    def printLevels(self):
+        if self.isQuiet:
+            return
+        lines = [str(self) + ":"]
+        for users, throughput, histogram in self.levels:
+            line = "%5d users: %.2f/sec." % (users, throughput)
+            predicted = self.getPredictedThroughput(users)
+            if predicted is not None:
+                line += " (fit %.2f/sec.)" % predicted
+            if histogram.getTotalCount():
+                line += ", p50 %s sec., p99 %s sec." % (histogram.getValueAtPercentile(50),
+                                                       histogram.getValueAtPercentile(99))
+            lines.append(line)
+        if self.sigma is not None:
+            lines.append("sigma=%.4f kappa=%.6f peak at %.1f users" %
+                         (self.sigma, self.kappa, self.getPeakConcurrency()))
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+
+    def __str__(self):
+        return "ScalabilityTest (1.." + str(self.maxUsers) + " users): " + str(self.test)
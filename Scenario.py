@@ -0,0 +1,267 @@
+"""
+ * The <code>Scenario</code> is a test that walks a graph of steps,
+ * each a test, choosing the next step at random according to the
+ * weights of the transitions from the current one.
+ * <p>
+ * One run of a scenario is one journey: it starts with a transition
+ * from <code>START</code>, runs steps until it takes a transition to
+ * <code>END</code>, or reaches a step with no transitions, and waits
+ * for a think time given by a <code>Timer</code> between steps.  A
+ * journey ends early when one of its steps fails.  Decorated as a
+ * <code>LoadTest</code>, each user runs journeys with the usual
+ * timers, iterations or duration.
+ * </p>
+ * <p>
+ * For example, for users that read 70% of the time, search 20%
+ * and write 10%, thinking 0.5 to 1.5 seconds in between, for ten
+ * steps per journey:
+ * <blockquote>
+ * <pre>
+ * scenario = Scenario(RandomTimer(500, 1000), maxSteps=10)
+ * scenario.addStep("read", ExampleTest("testRead"))
+ * scenario.addStep("search", ExampleTest("testSearch"))
+ * scenario.addStep("write", ExampleTest("testWrite"))
+ * for step in (Scenario.START, "read", "search", "write"):
+ *     scenario.addTransition(step, "read", 70)
+ *     scenario.addTransition(step, "search", 20)
+ *     scenario.addTransition(step, "write", 10)
+ * loadTest = LoadTest(scenario, 50, duration=300)
+ * </pre>
+ * </blockquote>
+ * </p>
+ * <p>
+ * The time of each step is recorded in a histogram of its own,
+ * and the time of each journey, excluding think times, in a journey
+ * histogram.  Journeys are published as samples to the sample
+ * listeners.  The histograms accumulate over runs until
+ * <code>reset()</code> is called, and <code>getStatistics()</code>
+ * reports them along with the throughput of each step.
+ * </p>
+"""
+
+import random
+import time
+from threading import Lock
+
+from Cancellation import Cancellation
+from CustomExceptions import IllegalArgumentException
+from Histogram import Histogram
+from Sample import FAILURE, ERROR, Sample, getCurrentUserId, publishSample, runSampled
+from Test import Test
+from VirtualUser import VirtualUser
+
+
+class Terminal:
+    """
+     * Marks the start or the end of a journey.  A terminal is
+     * pickled by the name of its module global, so that it keeps
+     * its identity in worker processes and load agents.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __reduce__(self):
+        return self.name
+
+    def __repr__(self):
+        return "Scenario." + self.name
+
+
+START = Terminal("START")
+END = Terminal("END")
+
+
+class Scenario(Test):
+
+    START = START
+    END = END
+
+    def __init__(self, thinkTimer=None, maxSteps=100):
+        """
+         * Constructs an empty <code>Scenario</code>.
+         *
+         * @param thinkTimer Timer giving the think time between
+         *        steps, or <code>None</code> for no think time.
+         * @param maxSteps Maximum number of steps in a journey.
+        """
+        if maxSteps < 1:
+            raise IllegalArgumentException("Maximum number of steps must be > 0")
+        self.thinkTimer = thinkTimer
+        self.maxSteps = maxSteps
+        self.steps = {}
+        self.stepNames = []
+        self.transitions = {}
+        self.sampleListeners = []
+        self.lock = Lock()
+        self.reset()
+
+    def addStep(self, name, test, thinkTimer=None):
+        """
+         * Adds a step.
+         *
+         * @param name Name of the step.
+         * @param test Test run by the step.
+         * @param thinkTimer Timer giving the think time after the
+         *        step, instead of the scenario's.
+        """
+        if name is None or isinstance(name, Terminal) or name in self.steps:
+            raise IllegalArgumentException("Step name must be unique and not None")
+        self.steps[name] = (test, thinkTimer)
+        self.stepNames.append(name)
+        self.stepHistograms[name] = Histogram()
+
+    def addTransition(self, fromStep, toStep, weight=1):
+        """
+         * Adds a weighted transition between two steps.
+         *
+         * @param fromStep Name of the step, or <code>START</code>.
+         * @param toStep Name of the step, or <code>END</code>.
+         * @param weight Relative weight of the transition among
+         *        the transitions from the same step.
+        """
+        if fromStep is END:
+            raise IllegalArgumentException("No transition can leave END")
+        if toStep is START:
+            raise IllegalArgumentException("No transition can lead to START")
+        for name in (fromStep, toStep):
+            if not isinstance(name, Terminal) and name not in self.steps:
+                raise IllegalArgumentException("Unknown step: " + str(name))
+        if weight <= 0:
+            raise IllegalArgumentException("Transition weight must be > 0")
+        targets, weights = self.transitions.setdefault(fromStep, ([], []))
+        targets.append(toStep)
+        weights.append(weight)
+
+    def reset(self):
+        """
+         * Discards the recorded step and journey times.
+        """
+        with self.lock:
+            self.stepHistograms = dict((name, Histogram()) for name in self.stepNames)
+            self.journeyHistogram = Histogram()
+            self.firstBeginTime = None
+            self.lastEndTime = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = Lock()
+
+    def countTestCases(self):
+        return 1
+
+    def addSampleListener(self, listener):
+        """
+         * Registers a sample listener.  Each journey is recorded
+         * as a sample whose elapsed time excludes think times.
+        """
+        self.sampleListeners.append(listener)
+        return True
+
+    def nextStep(self, step):
+        transitions = self.transitions.get(step)
+        if transitions is None:
+            if step is START and self.stepNames:
+                return self.stepNames[0]
+            return END
+        targets, weights = transitions
+        return random.choices(targets, weights)[0]
+
+    def run(self, result):
+        """
+         * Runs one journey.
+         *
+         * @param result Test result.
+        """
+        beginTime = time.time()
+        journeyTime = 0.0
+        outcome = None
+        errorType = None
+        step = self.nextStep(START)
+        for i in range(self.maxSteps):
+            if step is END or Cancellation.isCurrentCancelled():
+                break
+            if i > 0:
+                self.think(previousStep)
+                if VirtualUser.isCurrentRetired() or Cancellation.isCurrentCancelled():
+                    break
+            test = self.steps[step][0]
+            sample = runSampled(test, result, [self.stepHistograms[step]])
+            journeyTime += sample.elapsedTime
+            if outcome is None or sample.outcome in (FAILURE, ERROR):
+                outcome, errorType = sample.outcome, sample.errorType
+            if sample.outcome in (FAILURE, ERROR):
+                break
+            previousStep, step = step, self.nextStep(step)
+        if outcome is None:
+            return
+        self.journeyHistogram.recordValue(journeyTime)
+        with self.lock:
+            if self.firstBeginTime is None or beginTime < self.firstBeginTime:
+                self.firstBeginTime = beginTime
+            self.lastEndTime = max(self.lastEndTime or 0, time.time())
+        publishSample(self.sampleListeners,
+                      Sample(beginTime, journeyTime, getCurrentUserId(), outcome, errorType))
+
+    def __call__(self, result):
+        self.run(result)
+
+    def think(self, step):
+        thinkTimer = self.steps[step][1] or self.thinkTimer
+        if thinkTimer is not None:
+            delay = thinkTimer.getDelay()
+            if delay > 0:
+                time.sleep(delay * 0.001)
+
+    def getStepHistogram(self, step):
+        """
+         * Returns the histogram of the times of a step.
+        """
+        return self.stepHistograms[step]
+
+    def getJourneyHistogram(self):
+        """
+         * Returns the histogram of the times of the journeys,
+         * excluding think times.
+        """
+        return self.journeyHistogram
+
+    def getThroughput(self, step=None):
+        """
+         * Returns the number of runs of a step, or of journeys,
+         * completed per second since the first journey began.
+         *
+         * @param step Name of the step, or <code>None</code> for
+         *        journeys.
+        """
+        if self.firstBeginTime is None or self.lastEndTime <= self.firstBeginTime:
+            return None
+        histogram = self.journeyHistogram if step is None else self.stepHistograms[step]
+        return histogram.getTotalCount() / (self.lastEndTime - self.firstBeginTime)
+
+    def getStatistics(self):
+        """
+         * Returns a report of the count, throughput and
+         * percentiles of each step and of the journeys.
+        """
+        lines = []
+        for name, histogram in ([(name, self.stepHistograms[name]) for name in self.stepNames] +
+                                [("journey", self.journeyHistogram)]):
+            line = "%s: %d" % (name, histogram.getTotalCount())
+            throughput = self.getThroughput(None if histogram is self.journeyHistogram else name)
+            if throughput is not None:
+                line += ", %.2f/sec." % throughput
+            if histogram.getTotalCount():
+                line += ", p50 %s sec., p99 %s sec., max %s sec." % (
+                    histogram.getValueAtPercentile(50), histogram.getValueAtPercentile(99),
+                    histogram.getMax())
+            lines.append(line)
+        return "\n".join(lines)
+
+    def __str__(self):
+        return "Scenario (" + ", ".join(str(name) for name in self.stepNames) + ")"
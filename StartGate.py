@@ -0,0 +1,119 @@
+"""
+ * The <code>StartGate</code> parks the users of a load test until
+ * all of them are ready, then releases them together.
+ * <p>
+ * Without a gate, a <code>LoadTest</code> starts its users one after
+ * the other, and the first users may have completed before the last
+ * ones start, so that fewer users run concurrently than the load
+ * test claims.  With a gate, the thread of every user is started
+ * first and waits at the gate; the load test then opens the gate
+ * once all of them are waiting.  The gate notes when each user
+ * actually passes it, and the spread of those times is the start
+ * skew of the load test.
+ * </p>
+ * <p>
+ * The <code>InFlightConcurrency</code> sample listener verifies the
+ * concurrency achieved: it finds the largest number of iterations
+ * in progress at the same instant, by sweeping over the time spans
+ * of the samples.
+ * </p>
+"""
+
+import time
+from threading import Condition, Event, Lock
+
+
+class StartGate:
+
+	def __init__(self, users):
+		"""
+		 * Constructs a closed <code>StartGate</code>.
+		 *
+		 * @param users Number of users to wait for.
+		"""
+		self.users = users
+		self.condition = Condition()
+		self.parkedCount = 0
+		self.opened = Event()
+		self.passTimes = []
+
+	def park(self):
+		"""
+		 * Waits, in the thread of a user, until the gate opens.
+		"""
+		with self.condition:
+			self.parkedCount += 1
+			self.condition.notify_all()
+		self.opened.wait()
+		self.passTimes.append(time.perf_counter())
+
+	def waitForUsers(self, users=None, timeout=None):
+		"""
+		 * Blocks until all users, or the specified number of
+		 * users, are parked at the gate or the timeout expires.
+		 *
+		 * @return <code>true</code> if the users are parked.
+		"""
+		if users is None:
+			users = self.users
+		with self.condition:
+			return self.condition.wait_for(lambda: self.opened.is_set() or self.parkedCount >= users, timeout)
+
+	def open(self):
+		"""
+		 * Opens the gate, releasing the parked users.
+		"""
+		self.opened.set()
+		with self.condition:
+			self.condition.notify_all()
+
+	def getStartSkew(self):
+		"""
+		 * Returns the time (sec.) between the first and the last
+		 * user passing the gate, or <code>None</code>.
+		"""
+		passTimes = list(self.passTimes)
+		if not passTimes:
+			return None
+		return max(passTimes) - min(passTimes)
+
+
+class InFlightConcurrency:
+	"""
+	 * A sample listener that finds the largest number of
+	 * iterations in progress at the same time.
+	"""
+
+	def __init__(self):
+		self.lock = Lock()
+		self.spans = []
+
+	def __call__(self, sample):
+		with self.lock:
+			self.spans.append((sample.beginTime, sample.beginTime + sample.elapsedTime))
+
+	def newShard(self):
+		return InFlightConcurrency()
+
+	def mergeShard(self, shard):
+		with self.lock:
+			self.spans.extend(shard.spans)
+
+	def reset(self):
+		with self.lock:
+			self.spans = []
+
+	def getPeakConcurrency(self):
+		"""
+		 * Returns the largest number of samples whose time spans
+		 * overlap, counting a span that ends as another begins as
+		 * not overlapping it.
+		"""
+		with self.lock:
+			events = [(begin, 1) for begin, end in self.spans] + [(end, -1) for begin, end in self.spans]
+		events.sort()
+		inFlight = peak = 0
+		for t, delta in events:
+			inFlight += delta
+			peak = max(peak, inFlight)
+		return peak
@@ -0,0 +1,73 @@
+"""
+ * The <code>SteppedRampTimer</code> is a <code>Timer</code>
+ * that ramps a number of users up in equal steps, starting
+ * each step of users simultaneously, and, optionally, ramps
+ * them down again in steps after a hold period.
+ * <p>
+ * For example, to start 100 users in 5 steps of 20 users, one
+ * step every 10 seconds, use:
+ * <blockquote>
+ * <pre>
+ * timer = SteppedRampTimer(100, 40000, 5)
+ * </pre>
+ * </blockquote>
+ * </p>
+ *
+ * @see Timer
+"""
+
+from CustomExceptions import IllegalArgumentException
+from Timer import Timer
+
+class SteppedRampTimer(Timer):
+
+	def __init__(self, users, rampUpTime, steps, holdTime=None, rampDownTime=0):
+		"""
+		 * Constructs a <code>SteppedRampTimer</code>.
+		 *
+		 * @param users Number of users to ramp up.
+		 * @param rampUpTime Time between the first and the last
+		 *        step (in milliseconds).
+		 * @param steps Number of steps.
+		 * @param holdTime Time during which all users run once the
+		 *        ramp up is complete (in milliseconds), or
+		 *        <code>None</code> to let users run all of their
+		 *        iterations without ramping down.
+		 * @param rampDownTime Time between the first and the last
+		 *        step of the ramp down (in milliseconds).
+		"""
+		if users < 1:
+			raise IllegalArgumentException("Number of users must be > 0")
+		if steps < 1:
+			raise IllegalArgumentException("Number of steps must be > 0")
+		if rampUpTime < 0 or rampDownTime < 0 or (holdTime is not None and holdTime < 0):
+			raise IllegalArgumentException("Ramp and hold times must be >= 0")
+		self.users = users
+		self.rampUpTime = rampUpTime
+		self.steps = min(steps, users)
+		self.holdTime = holdTime
+		self.rampDownTime = rampDownTime
+
+	def getDelay(self):
+		"""
+		 * Returns the delay between two steps.
+		 *
+		 * @return Delay (in milliseconds).
+		"""
+		if self.steps == 1:
+			return 0
+		return self.rampUpTime / (self.steps - 1)
+
+	def getStep(self, user):
+		return min(user, self.users - 1) * self.steps // self.users
+
+	def getStartTime(self, user, previousStartTime):
+		return self.getStep(user) * self.getDelay()
+
+	def getRetireTime(self, user):
+		if self.holdTime is None:
+			return None
+		if self.steps == 1:
+			return self.rampUpTime + self.holdTime
+		return (self.rampUpTime + self.holdTime +
+				self.getStep(user) * self.rampDownTime / (self.steps - 1))
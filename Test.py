@@ -6,8 +6,12 @@
  * Ported to Python by Grig Gheorghiu *
  **************************************
 """
+from CustomExceptions import AssertionFailedError
+
 class Test:
 
+    failureException = AssertionFailedError
+
     def countTestCases(self):
         """
          * Counts the number of test cases that will be run by this test.
@@ -22,6 +26,18 @@ class Test:
         """
         None
         
+    def addSampleListener(self, listener):
+        """
+         * Registers a listener to be passed a <code>Sample</code>
+         * for each timed invocation made by this test.
+         *
+         * @param listener Callable accepting a <code>Sample</code>.
+         * @return <code>true</code> if this test, or a test it
+         *         decorates, will produce samples; <code>false</code>
+         *         otherwise.
+        """
+        return False
+
     def shortDescription(self):
         return str(self)
         
@@ -2,7 +2,10 @@ __author__ = 'noga'
 
 from unittest import TestSuite, TextTestRunner, TestCase
 from LoadTest import LoadTest
+from MicroBenchmarkTest import MicroBenchmarkTest
+from ParameterFeed import ParameterFeed
 from TimedTest import TimedTest
+import inspect
 import time
 
 class CallContainer:
@@ -10,21 +13,39 @@ class CallContainer:
     def __init__(self, method, *args):
         self.method = method
         self.args = args
+        self.feed = None
+        if len(args) == 1 and isinstance(args[0], ParameterFeed):
+            self.feed = args[0]
         self.timing = None
         self.result = None
         self.error = None
     pass
 
     def __call__(self, *args, **kwargs):
+        args = self.args
+        if self.feed is not None:
+            args = self.feed.next()
         try:
             st = time.time()
-            self.result = self.method(*self.args)
+            self.result = self.method(*args)
+            if inspect.isawaitable(self.result):
+                return self.await_result(st)
             self.timing = time.time() - st
             self.error = None
         except Exception as e:
             self.error = e
             self.result = None
-        pass
+            raise
+
+    async def await_result(self, st):
+        try:
+            self.result = await self.result
+            self.timing = time.time() - st
+            self.error = None
+        except Exception as e:
+            self.error = e
+            self.result = None
+            raise
 
 
 class TestCaseWithParameters(TestCase):
@@ -40,7 +61,7 @@ class TestCaseWithParameters(TestCase):
         pass
 
     def test(self):
-        self.call_container()
+        return self.call_container()
 
 
     def __str__(self):
@@ -55,6 +76,10 @@ class TestCaseWithParameters(TestCase):
         return timedTest
         pass
 
+    @staticmethod
+    def micro_benchmark( method, max_time_per_call, *args):
+        return MicroBenchmarkTest( method, *args, maxTimePerCall=max_time_per_call)
+
 
 
 class ExampleLoadTestWithParameters :
@@ -26,6 +26,11 @@ class TestDecorator(Test):
     def run(self, result):
         self.basicRun(result)
     
+    def addSampleListener(self, listener):
+        if isinstance(self.test, Test):
+            return self.test.addSampleListener(listener)
+        return False
+
     def __str__(self):
         return str(self.test)
 
@@ -9,6 +9,8 @@
  **************************************
 """
 
+from threading import Condition
+
 class ThreadBarrier:
 
 	def __init__(self, numDispatched):
@@ -20,6 +22,7 @@ class ThreadBarrier:
 		"""
 		self.returnedCount = 0
 		self.dispatchedCount = numDispatched
+		self.condition = Condition()
 
 	def onCompletion(self, t):
 		"""
@@ -27,7 +30,10 @@ class ThreadBarrier:
 
 		@param t Completed thread.
 		"""
-		self.returnedCount += 1
+		with self.condition:
+			self.returnedCount += 1
+			if self.returnedCount >= self.dispatchedCount:
+				self.condition.notify_all()
 
 	def isReached(self):
 		"""
@@ -39,6 +45,27 @@ class ThreadBarrier:
 		"""
 		return (self.returnedCount >= self.dispatchedCount)
 
+	def waitForCompletion(self, timeout=None):
+		"""
+		Blocks until the thread barrier has been reached or
+		the timeout expires.
+
+		@param timeout Maximum time to wait (in seconds), or
+				<code>None</code> to wait indefinitely.
+		@return <code>true</code> if the barrier has been reached;
+				<code>false</code> if the timeout expired.
+		"""
+		with self.condition:
+			return self.condition.wait_for(self.isReached, timeout)
+
+	def reset(self):
+		"""
+		Resets the count of returned threads so that the
+		barrier can be reused.
+		"""
+		with self.condition:
+			self.returnedCount = 0
+
 
 	def cancelThreads(self, threadCount):
 		"""
@@ -46,4 +73,6 @@ class ThreadBarrier:
 
 		@param threadCount Number of threads to cancel.
 		"""
-		self.returnedCount += threadCount
+		with self.condition:
+			self.returnedCount += threadCount
+			self.condition.notify_all()
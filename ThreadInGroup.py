@@ -14,6 +14,9 @@ class ThreadInGroup(Thread):
 		self.group = group
 		self.group.addThread(self)
 
-	def __del__(self):
-		self.group.delThread(self)
+	def run(self):
+		try:
+			Thread.run(self)
+		finally:
+			self.group.delThread(self)
 		
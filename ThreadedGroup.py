@@ -16,20 +16,54 @@
  **************************************
 """
 
+from threading import Condition
+
 class ThreadedGroup:
 
 	def __init__(self, name):
 		self.name = name
 		self.threads = []
+		self.released = False
+		self.condition = Condition()
 		
 	def addThread(self, thread):
-		self.threads.append(thread)
+		with self.condition:
+			self.threads.append(thread)
 		
 	def delThread(self, thread):
-		self.threads.remove(thread)
+		with self.condition:
+			if thread in self.threads:
+				self.threads.remove(thread)
+			if not self.threads:
+				self.condition.notify_all()
 
 	def activeCount(self):
 		return len(self.threads)
+
+	def waitForAllThreads(self, timeout=None):
+		"""
+		Blocks until every thread of this group has completed
+		or the timeout expires.
+
+		@param timeout Maximum time to wait (in seconds), or
+				<code>None</code> to wait indefinitely.
+		@return <code>true</code> if all threads have completed;
+				<code>false</code> if the timeout expired or the
+				waiting thread was released.
+		"""
+		with self.condition:
+			self.condition.wait_for(lambda: not self.threads or self.released, timeout)
+			self.released = False
+			return not self.threads
+
+	def release(self):
+		"""
+		Releases the thread waiting for the threads of this
+		group to complete.
+		"""
+		with self.condition:
+			self.released = True
+			self.condition.notify_all()
 		
 	def getName(self):
 		return self.name
@@ -9,14 +9,17 @@
  **************************************
 """
 import time
-from threading import currentThread
+from threading import Lock, currentThread
 from ThreadInGroup import ThreadInGroup
+from Cancellation import Cancellation
+from ResultShard import ResultShard
+from Sample import runSampled
 from Test import Test
 from ThreadBarrier import ThreadBarrier
 
 class ThreadedTest(Test):
 
-	def __init__(self, test, thread_group=None, thread_barrier=None):
+	def __init__(self, test, thread_group=None, thread_barrier=None, pool=None, sharded=False):
 		"""
 		Constructs a <code>ThreadedTest</code> to decorate the
 		specified test using the specified thread group and
@@ -25,13 +28,23 @@ class ThreadedTest(Test):
 		@param test Test to decorate.
 		@param group Thread group.
 		@param barrier Thread barrier.
+		@param pool <code>WorkerPool</code> running the test, or
+				<code>None</code> to start a new thread for each run.
+		@param sharded <code>true</code> to have each run report to
+				its own <code>ResultShard</code>, until
+				<code>mergeShards()</code> is called.
 		"""
 		#self.test = test_class(test_name)
 		self.test = test
 		self.group = thread_group
 		self.barrier = thread_barrier
+		self.pool = pool
 		if self.barrier is None:
 			self.barrier = ThreadBarrier(1)
+		self.sampleListeners = []
+		self.sharded = sharded
+		self.shards = []
+		self.resultLock = Lock()
 
 
 	def countTestCases(self):
@@ -42,31 +55,91 @@ class ThreadedTest(Test):
 		"""
 		return self.test.countTestCases()
 
+	def addSampleListener(self, listener):
+		"""
+		Registers a sample listener.  Each run of the decorated
+		test is recorded as a sample, unless the decorated test
+		produces finer grained samples itself.
+		"""
+		if not (isinstance(self.test, Test) and self.test.addSampleListener(listener)):
+			self.sampleListeners.append(listener)
+		return True
 
-	def run(self, result):
+	def run(self, result, user=None, gate=None):
 		"""
 		Runs this test.
 		
 		@param result Test result.
+		@param user <code>VirtualUser</code> the test runs for.
+		@param gate <code>StartGate</code> the test waits at before
+				running, or <code>None</code>.
 		"""
-		test_runner = TestRunner(result, self.test, self.barrier)
+		shard = None
+		if self.sharded:
+			shard = ResultShard(result, self.resultLock)
+			self.shards.append(shard)
+		test_runner = TestRunner(result, self.test, self.barrier, self.sampleListeners, user, shard, gate)
+		if self.pool is not None:
+			self.pool.submit(test_runner, self.group)
+			return
 		t = ThreadInGroup(group=self.group, target=test_runner)
 		#print "ThreadedTest thread starting at:", time.time()
 		t.start()
 		#return t
 		#t.join()
 
+	def mergeShards(self):
+		"""
+		Merges the result shards of the runs started so far into
+		their test results, in the order the runs were started.
+		"""
+		shards, self.shards = self.shards, []
+		for shard in shards:
+			shard.merge()
+
 	def __str__(self):
 		return "ThreadedTest: " + str(self.test)
 		
 class TestRunner:
 
-	def __init__(self, result, test, barrier):
+	def __init__(self, result, test, barrier, sampleListeners=(), user=None, shard=None, gate=None):
 		self.result = result
+		self.shard = shard
+		self.gate = gate
 		self.test = test
 		self.barrier = barrier
+		self.sampleListeners = sampleListeners
+		self.user = user
+		self.cancellation = Cancellation.current()
 	
 	def __call__(self):
-		self.test.run(self.result)
+		if self.gate is not None:
+			self.gate.park()
+		if self.cancellation is not None:
+			if not self.cancellation.isCancelled():
+				with self.cancellation:
+					self.runAsUser()
+		else:
+			self.runAsUser()
 		self.barrier.onCompletion(currentThread())
+
+	def runAsUser(self):
+		if self.user is not None:
+			with self.user:
+				self.runInShard()
+		else:
+			self.runInShard()
+
+	def runInShard(self):
+		if self.shard is not None:
+			with self.shard:
+				self.runTest(self.shard)
+		else:
+			self.runTest(self.result)
+
+	def runTest(self, result):
+		if self.sampleListeners:
+			runSampled(self.test, result, self.sampleListeners)
+		else:
+			self.test.run(result)
 	
@@ -0,0 +1,196 @@
+"""
+ * The <code>ThroughputTest</code> is a test decorator that runs a
+ * <code>LoadTest</code> or a <code>RepeatedTest</code> and asserts
+ * the rate at which its iterations complete.
+ * <p>
+ * The completion times of the iterations are collected through a
+ * sample listener, and the throughput is computed both over the
+ * whole run and over windows of a fixed duration sliding across
+ * it.  A <code>ThroughputTest</code> fails if the throughput of any
+ * window drops below the minimum throughput, so that a stall in the
+ * middle of a run is not hidden by the average, and optionally if
+ * the worst window falls below a fraction of the mean throughput.
+ * </p>
+ * <p>
+ * For example, to require 20 users to sustain at least 5000
+ * iterations per second, measured over 1 second windows, with no
+ * window below 80% of the mean, use:
+ * <blockquote>
+ * <pre>
+ * loadTest = LoadTest(ExampleTest("testSomething"), 20, duration=60)
+ * throughputTest = ThroughputTest(loadTest, 5000, window=1,
+ *                                 minWindowFraction=0.8)
+ * </pre>
+ * </blockquote>
+ * </p>
+"""
+
+import sys
+from threading import Lock
+
+from CustomExceptions import AssertionFailedError, IllegalArgumentException
+from TestDecorator import TestDecorator
+
+
+class ThroughputTest(TestDecorator):
+
+    def __init__(self, test, minThroughput, window=1.0, minWindowFraction=None, windowStep=None):
+        """
+         * Constructs a <code>ThroughputTest</code> to decorate the
+         * specified test with the specified minimum throughput.
+         *
+         * @param test <code>LoadTest</code> or <code>RepeatedTest</code>
+         *        to decorate.
+         * @param minThroughput Minimum number of iterations completed
+         *        per second, in every window.
+         * @param window Duration (sec.) of the sliding windows.
+         * @param minWindowFraction Minimum throughput of the worst
+         *        window, as a fraction of the mean throughput, or
+         *        <code>None</code>.
+         * @param windowStep Interval (sec.) between the starts of
+         *        successive windows; a quarter of the window by default.
+        """
+        TestDecorator.__init__(self, test)
+        if minThroughput < 0:
+            raise IllegalArgumentException("Minimum throughput must be >= 0")
+        if window <= 0:
+            raise IllegalArgumentException("Window must be > 0")
+        if minWindowFraction is not None and (minWindowFraction < 0 or minWindowFraction > 1):
+            raise IllegalArgumentException("Minimum window fraction must be between 0 and 1")
+        self.minThroughput = minThroughput
+        self.window = window
+        self.minWindowFraction = minWindowFraction
+        self.windowStep = windowStep or window / 4.0
+        self.isQuiet = False
+        self.lock = Lock()
+        self.startTimes = []
+        self.completionTimes = []
+        if not TestDecorator.addSampleListener(self, self.onSample):
+            raise IllegalArgumentException("ThroughputTest requires a test that records samples, "
+                                           "such as a LoadTest or a RepeatedTest")
+
+    def setQuiet(self):
+        """
+         * Disables the output of the test's throughput.
+        """
+        self.isQuiet = True
+
+    def countTestCases(self):
+        return TestDecorator.countTestCases(self)
+
+    def onSample(self, sample):
+        with self.lock:
+            self.startTimes.append(sample.beginTime)
+            self.completionTimes.append(sample.beginTime + sample.elapsedTime)
+
+    def run(self, result):
+        with self.lock:
+            self.startTimes = []
+            self.completionTimes = []
+        TestDecorator.run(self, result)
+        self.printThroughput()
+        self.checkThroughput(result)
+
+    def __call__(self, result):
+        self.run(result)
+
+    def getSpan(self):
+        """
+         * Returns the begin and end times of the last run, from
+         * the start of its first iteration to the completion of
+         * its last one.
+        """
+        return min(self.startTimes), max(self.completionTimes)
+
+    def getThroughput(self):
+        """
+         * Returns the mean number of iterations completed per
+         * second during the last run, or <code>None</code>.
+        """
+        if not self.completionTimes:
+            return None
+        begin, end = self.getSpan()
+        if end <= begin:
+            return None
+        return len(self.completionTimes) / (end - begin)
+
+    def getWindowThroughputs(self):
+        """
+         * Returns the list of <code>(windowStart, throughput)</code>
+         * pairs of the last run.  A run shorter than one window is
+         * a single window.
+        """
+        if not self.completionTimes:
+            return []
+        begin, end = self.getSpan()
+        if end - begin <= self.window:
+            throughput = self.getThroughput()
+            if throughput is None:
+                return []
+            return [(begin, throughput)]
+        times = sorted(self.completionTimes)
+        throughputs = []
+        first = last = 0
+        windowStart = begin
+        while windowStart + self.window <= end:
+            windowEnd = windowStart + self.window
+            while first < len(times) and times[first] < windowStart:
+                first += 1
+            while last < len(times) and times[last] < windowEnd:
+                last += 1
+            throughputs.append((windowStart, (last - first) / self.window))
+            windowStart += self.windowStep
+        return throughputs
+
+    def getWorstWindow(self):
+        """
+         * Returns the <code>(windowStart, throughput)</code> pair
+         * of the slowest window of the last run, or <code>None</code>.
+        """
+        throughputs = self.getWindowThroughputs()
+        if not throughputs:
+            return None
+        return min(throughputs, key=lambda window: window[1])
+
+    def checkThroughput(self, result):
+        """
+         * Signals a failure if the worst window of the last run
+         * is below the minimum throughput, or below the minimum
+         * fraction of the mean throughput.
+         *
+         * @param result Test result.
+        """
+        worst = self.getWorstWindow()
+        if worst is None:
+            self.addFailure(result, "No iteration completed!")
+            return
+        windowStart, throughput = worst
+        offset = windowStart - self.getSpan()[0]
+        if throughput < self.minThroughput:
+            self.addFailure(result, "Minimum throughput not reached! Expected " +
+                            str(self.minThroughput) + "/sec., but was " + "%.2f" % throughput +
+                            "/sec. in the window starting at " + "%.2f" % offset + " sec.")
+        mean = self.getThroughput()
+        if self.minWindowFraction is not None and throughput < self.minWindowFraction * mean:
+            self.addFailure(result, "Throughput dropped! Expected at least " +
+                            "%g" % (self.minWindowFraction * 100) + "% of the mean " +
+                            "%.2f" % mean + "/sec., but was " + "%.2f" % throughput +
+                            "/sec. in the window starting at " + "%.2f" % offset + " sec.")
+
+    def addFailure(self, result, message):
+        result.addFailure(self.getTest(),
+                          (AssertionFailedError, AssertionFailedError(message), None))
+        result.stop()
+
+    def printThroughput(self):
+        if not self.isQuiet:
+            line = str(self) + ": " + str(len(self.completionTimes)) + " iterations"
+            mean = self.getThroughput()
+            worst = self.getWorstWindow()
+            if mean is not None and worst is not None:
+                line += ", %.2f/sec., worst %g sec. window %.2f/sec." % (mean, self.window, worst[1])
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+    def __str__(self):
+        return "ThroughputTest: " + str(self.test)
@@ -39,6 +39,27 @@
  * Test timedTest = new TimedTest(new ExampleTest("testSomething"), 2000, false);
  * </pre>
  * </blockquote>
+ * A non-waiting <code>TimedTest</code> runs its decorated test in a
+ * daemon thread and returns as soon as the maximum elapsed time is
+ * exceeded.  The failure is signalled from a watchdog thread shared
+ * by all timed tests, along with the stacks of the threads still
+ * running the decorated test, which is also cancelled cooperatively
+ * (see <code>Cancellation</code>).
+ * </p>
+ * <p>
+ * When the decorated test is a <code>LoadTest</code> or a
+ * <code>RepeatedTest</code>, the elapsed time of each of its
+ * iterations is recorded in a <code>Histogram</code>, and the
+ * percentiles of that distribution can be asserted against
+ * separate maximum times.  For example, to require a median
+ * iteration time of 0.1 seconds, a 99th percentile of 0.5
+ * seconds and a maximum of 1 second, use:
+ * <blockquote>
+ * <pre>
+ * timedTest = TimedTest(loadTest, 20,
+ *                       percentileLimits={50: 0.1, 99: 0.5, 100: 1})
+ * </pre>
+ * </blockquote>
  * </p>
  * 
  * @author <b>Mike Clark</b>
@@ -50,21 +71,17 @@
 """
 
 from unittest import TestResult
-from threading import Thread
-import sys, time
+import contextvars, sys, threading, time, traceback
 
-from CustomExceptions import AssertionFailedError
+from Cancellation import Cancellation
+from CustomExceptions import AssertionFailedError, IllegalArgumentException, TestCancelledError
+from Histogram import Histogram
 from TestDecorator import TestDecorator
-
-try:
-    bool = True
-except:
-    True = 1
-    False = 0
+from Watchdog import Watchdog
 
 
 class TimedTest(TestDecorator):
-    def __init__(self, test, maxElapsedTime, percentile=90, waitForCompletion=True):
+    def __init__(self, test, maxElapsedTime, percentile=90, waitForCompletion=True, percentileLimits=None):
         """
          * Constructs a <code>TimedTest</code> to decorate the
          * specified test with the specified maximum elapsed time.
@@ -78,6 +95,11 @@ class TimedTest(TestDecorator):
          *        <code>false</code> to indicate that the
          *        <code>TimedTest</code> should immediately signal
          *        a failure when the maximum elapsed time is exceeded.
+         * @param percentile Iteration time percentile reported
+         *        along with the elapsed time.
+         * @param percentileLimits Dictionary mapping percentiles
+         *        (100 being the maximum) to the maximum iteration
+         *        time (sec.) allowed at that percentile.
         """
         TestDecorator.__init__(self, test)
         self.maxElapsedTime = maxElapsedTime
@@ -86,6 +108,30 @@ class TimedTest(TestDecorator):
         self.maxElapsedTimeExceeded = False
         self.isQuiet = False
         self.test = test
+        self.percentileLimits = {}
+        for p, maxTime in (percentileLimits or {}).items():
+            self.setPercentileLimit(p, maxTime)
+        self.histogram = Histogram()
+        self.isSampled = TestDecorator.addSampleListener(self, self.histogram)
+
+    def setPercentileLimit(self, percentile, maxTime):
+        """
+         * Sets the maximum iteration time allowed at the
+         * specified percentile.
+         *
+         * @param percentile Percentile (0 to 100, 100 being the maximum).
+         * @param maxTime Maximum iteration time (sec.).
+        """
+        if percentile <= 0 or percentile > 100:
+            raise IllegalArgumentException("Percentile must be > 0 and <= 100")
+        self.percentileLimits[percentile] = maxTime
+
+    def getHistogram(self):
+        """
+         * Returns the histogram of iteration times recorded
+         * during the last run.
+        """
+        return self.histogram
 
     def setQuiet(self):
         """
@@ -127,11 +173,15 @@ class TimedTest(TestDecorator):
          * @param result Test result.
         """
 
+        self.histogram.reset()
         beginTime = time.time()
         TestDecorator.run(self, result)
 
         elapsedTime = self.getElapsedTime(beginTime)
+        if not self.isSampled:
+            self.histogram.recordValue(elapsedTime)
         self.printElapsedTime(elapsedTime)
+        self.checkPercentileLimits(result)
         if elapsedTime > self.maxElapsedTime:
             self.maxElapsedTimeExceeded = True
             result.addFailure(self.getTest(),
@@ -142,35 +192,122 @@ class TimedTest(TestDecorator):
             # result.endTest(self.getTest())
             result.stop()
 
+    def checkPercentileLimits(self, result):
+        """
+         * Signals a failure for each percentile of the iteration
+         * times that exceeds its maximum time.
+         *
+         * @param result Test result.
+        """
+        for percentile in sorted(self.percentileLimits):
+            maxTime = self.percentileLimits[percentile]
+            value = self.histogram.getValueAtPercentile(percentile)
+            if value is not None and value > maxTime:
+                self.maxElapsedTimeExceeded = True
+                result.addFailure(self.getTest(),
+                                  (AssertionFailedError,
+                                   AssertionFailedError(self.getPercentileName(percentile) +
+                                                        " iteration time exceeded! Expected " + str(maxTime) +
+                                                        " sec., but was " + str(value) + " sec."), None))
+                result.stop()
+
+    def getPercentileName(self, percentile):
+        if percentile >= 100:
+            return "Maximum"
+        return "%gth percentile" % percentile
+
     def runUntilTimeExpires(self, result):
         """
          * Runs the test and immediately signals a failure
          * when the maximum elapsed time is exceeded.
+         * <p>
+         * The test is run in a daemon thread, and the maximum
+         * elapsed time is watched by the shared <code>Watchdog</code>.
+         * When it expires, the stacks of the threads running the
+         * test are added to the failure, the test's
+         * <code>Cancellation</code> is signalled, so that it stops
+         * at its next cancellation point, and this method returns
+         * without waiting for the test any longer.  An exception
+         * raised by the test is re-raised here if the test ends
+         * in time, or added to the result as an error otherwise.
+         * </p>
          *
          * @param result Test result.
         """
-        runnable = Runnable(self, result)
-        t = Thread(group=None, target=runnable)
+        self.histogram.reset()
+        cancellation = Cancellation()
+        finished = threading.Event()
+        lock = threading.Lock()
+        errors = []
+        returned = []
 
-        beginTime = time.time()
+        def runTest():
+            try:
+                with cancellation:
+                    TestDecorator.run(self, result)
+            except TestCancelledError:
+                pass
+            except Exception:
+                with lock:
+                    if returned:
+                        result.addError(self.getTest(), sys.exc_info())
+                    else:
+                        errors.append(sys.exc_info())
+            finally:
+                finished.set()
+
+        def expire():
+            self.onTimeExpired(result, cancellation)
+            finished.set()
 
+        t = threading.Thread(target=contextvars.copy_context().run, args=(runTest,),
+                             name="TimedTest: " + str(self.test))
+        t.daemon = True
+        deadline = Watchdog.getInstance().schedule(self.maxElapsedTime, expire)
+        beginTime = time.time()
         t.start()
+        finished.wait()
+        deadline.cancel()
+        with lock:
+            returned.append(True)
+        if errors:
+            raise errors[0][1].with_traceback(errors[0][2])
 
-        try:
-            t.join(self.maxElapsedTime)
-        except:
-            pass
+        elapsedTime = self.getElapsedTime(beginTime)
+        if not self.isSampled:
+            self.histogram.recordValue(elapsedTime)
+        self.printElapsedTime(elapsedTime)
+        if not self.maxElapsedTimeExceeded:
+            self.checkPercentileLimits(result)
 
-        self.printElapsedTime(self.getElapsedTime(beginTime))
+    def onTimeExpired(self, result, cancellation):
+        """
+         * Called by the watchdog thread when the maximum
+         * elapsed time is exceeded.
+        """
+        self.maxElapsedTimeExceeded = True
+        result.addFailure(self.getTest(),
+                          (AssertionFailedError,
+                           AssertionFailedError("Maximum elapsed time (" + str(self.maxElapsedTime) +
+                                                " sec.) exceeded!" +
+                                                self.getStacks(cancellation.getThreadIds())), None))
+        # result.endTest(self.getTest())
+        result.stop()
+        cancellation.cancel()
 
-        if t.isAlive():
-            self.maxElapsedTimeExceeded = True
-            result.addFailure(self.getTest(),
-                              (AssertionFailedError,
-                               AssertionFailedError("Maximum elapsed time (" + str(self.maxElapsedTime) +
-                                                    " sec.) exceeded!"), None))
-            # result.endTest(self.getTest())
-            result.stop()
+    def getStacks(self, threadIds):
+        """
+         * Returns the current stacks of the specified threads.
+        """
+        frames = sys._current_frames()
+        names = dict((t.ident, t.name) for t in threading.enumerate())
+        stacks = ""
+        for threadId in threadIds:
+            frame = frames.get(threadId)
+            if frame is not None:
+                stacks += ("\n\nStack of thread " + names.get(threadId, str(threadId)) + ":\n" +
+                           "".join(traceback.format_stack(frame)))
+        return stacks
 
     def getElapsedTime(self, beginTime):
         endTime = time.time()
@@ -178,7 +315,12 @@ class TimedTest(TestDecorator):
 
     def printElapsedTime(self, elapsedTime):
         if not self.isQuiet:
-            sys.stdout.write(str(self) + ": " + str(elapsedTime) + " sec.\n")
+            line = str(self) + ": " + str(elapsedTime) + " sec."
+            if self.histogram.getTotalCount() > 1:
+                line += (" (" + str(self.histogram.getTotalCount()) + " iterations, p" +
+                         "%g" % self.percentile + " " + str(self.histogram.getValueAtPercentile(self.percentile)) +
+                         " sec., max " + str(self.histogram.getMax()) + " sec.)")
+            sys.stdout.write(line + "\n")
             sys.stdout.flush()
 
     def __str__(self):
@@ -186,15 +328,3 @@ class TimedTest(TestDecorator):
             return "TimedTest (WAITING): " + str(self.test)  # str(TestDecorator(self))
         else:
             return "TimedTest (NON-WAITING): " + str(self.test)  # str(TestDecorator(self))
-
-
-class Runnable:
-    def __init__(self, timed_test, result):
-        self.timed_test = timed_test
-        self.result = result
-
-    def __call__(self):
-        TestDecorator.run(self.timed_test, self.result)
-
-    # IBM's JVM prefers this instead:
-    # run(result);
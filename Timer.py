@@ -18,3 +18,36 @@ class Timer:
 		 "Abstract" class
 		"""
 		None
+
+	def getStartTime(self, user, previousStartTime):
+		"""
+		 * Returns the time at which the specified user is started,
+		 * relative to the start of the load test.
+		 * <p>
+		 * Load tests schedule each user against this absolute
+		 * start time, so that the time taken to start users does
+		 * not accumulate into the delays.  By default, the first
+		 * user is started immediately and each following user is
+		 * started <code>getDelay()</code> after the previous one.
+		 * </p>
+		 *
+		 * @param user Index of the user (starting at 0).
+		 * @param previousStartTime Start time of the previous user
+		 *        (in milliseconds).
+		 * @return Start time (in milliseconds).
+		"""
+		if user == 0:
+			return 0
+		return previousStartTime + self.getDelay()
+
+	def getRetireTime(self, user):
+		"""
+		 * Returns the time at which the specified user stops
+		 * starting new iterations, relative to the start of the
+		 * load test, or <code>None</code> if the user runs all
+		 * of its iterations.
+		 *
+		 * @param user Index of the user (starting at 0).
+		 * @return Retire time (in milliseconds), or <code>None</code>.
+		"""
+		return None
@@ -0,0 +1,61 @@
+"""
+ * A <code>VirtualUser</code> identifies the simulated user
+ * on whose behalf a test is currently running.
+ * <p>
+ * Load tests install a <code>VirtualUser</code> in the thread,
+ * process or task that runs each user, so that the decorators
+ * it runs can find out which user they are running for, and
+ * whether that user has been retired and should not start
+ * another iteration.
+ * </p>
+"""
+
+import time
+from contextvars import ContextVar
+
+currentUser = ContextVar("currentUser", default=None)
+
+
+class VirtualUser:
+
+    def __init__(self, userId, retireTime=None):
+        """
+         * Constructs a <code>VirtualUser</code>.
+         *
+         * @param userId Index of the user (starting at 0).
+         * @param retireTime Value of <code>time.perf_counter()</code>
+         *        after which the user starts no new iteration, or
+         *        <code>None</code> if the user is never retired.
+        """
+        self.userId = userId
+        self.retireTime = retireTime
+
+    def isRetired(self):
+        return self.retireTime is not None and time.perf_counter() >= self.retireTime
+
+    def __enter__(self):
+        self.token = currentUser.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        currentUser.reset(self.token)
+        return False
+
+    def __str__(self):
+        return "VirtualUser " + str(self.userId)
+
+    @staticmethod
+    def current():
+        """
+         * Returns the <code>VirtualUser</code> being run, or
+         * <code>None</code> outside of a load test.
+        """
+        return currentUser.get()
+
+    @staticmethod
+    def isCurrentRetired():
+        """
+         * Determines whether the user being run has been retired.
+        """
+        user = currentUser.get()
+        return user is not None and user.isRetired()
@@ -0,0 +1,109 @@
+"""
+ * The <code>Watchdog</code> runs callbacks when their deadlines
+ * expire, using a single thread for all of them.
+ * <p>
+ * Non-waiting <code>TimedTest</code>s register their maximum
+ * elapsed time with the shared watchdog instead of each starting
+ * a thread of their own.  Deadlines are kept in a heap, so the
+ * watchdog thread only wakes up when the earliest deadline expires
+ * or an earlier one is registered.
+ * </p>
+"""
+
+import heapq
+import itertools
+import time
+import traceback
+from threading import Condition, Lock, Thread
+
+
+class Watchdog:
+
+    instance = None
+
+    def __init__(self, name="Watchdog"):
+        self.deadlines = []
+        self.sequence = itertools.count()
+        self.condition = Condition()
+        self.thread = Thread(target=self.watch, name=name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    @staticmethod
+    def getInstance():
+        """
+         * Returns the watchdog shared by all timed tests,
+         * starting it if needed.
+        """
+        if Watchdog.instance is None:
+            with sharedLock:
+                if Watchdog.instance is None:
+                    Watchdog.instance = Watchdog()
+        return Watchdog.instance
+
+    def schedule(self, timeout, callback):
+        """
+         * Schedules a callback to be run by the watchdog thread
+         * once the timeout expires.
+         *
+         * @param timeout Timeout (in seconds).
+         * @param callback Callable to run.
+         * @return <code>Deadline</code> that can be cancelled.
+        """
+        deadline = Deadline(time.perf_counter() + timeout, callback)
+        with self.condition:
+            heapq.heappush(self.deadlines, (deadline.expiryTime, next(self.sequence), deadline))
+            if self.deadlines[0][2] is deadline:
+                self.condition.notify()
+        return deadline
+
+    def watch(self):
+        while True:
+            with self.condition:
+                while True:
+                    while self.deadlines and self.deadlines[0][2].cancelled:
+                        heapq.heappop(self.deadlines)
+                    if not self.deadlines:
+                        self.condition.wait()
+                        continue
+                    timeout = self.deadlines[0][0] - time.perf_counter()
+                    if timeout <= 0:
+                        deadline = heapq.heappop(self.deadlines)[2]
+                        break
+                    self.condition.wait(timeout)
+            deadline.expire()
+
+
+class Deadline:
+
+    def __init__(self, expiryTime, callback):
+        self.expiryTime = expiryTime
+        self.callback = callback
+        self.cancelled = False
+        self.expired = False
+        self.lock = Lock()
+
+    def cancel(self):
+        """
+         * Cancels the deadline, waiting for its callback to
+         * complete if it is already running.
+         *
+         * @return <code>true</code> if the callback will not run;
+         *         <code>false</code> if it has run.
+        """
+        with self.lock:
+            self.cancelled = True
+            return not self.expired
+
+    def expire(self):
+        with self.lock:
+            if self.cancelled:
+                return
+            self.expired = True
+            try:
+                self.callback()
+            except Exception:
+                traceback.print_exc()
+
+
+sharedLock = Lock()
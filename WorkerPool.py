@@ -0,0 +1,94 @@
+"""
+ * The <code>WorkerPool</code> is a fixed-size pool of long-lived
+ * worker threads to which the users of load tests are submitted.
+ * <p>
+ * By default, a <code>LoadTest</code> starts a new thread for each
+ * user every time it runs.  A <code>WorkerPool</code> starts its
+ * threads once, when it is constructed, so that their start-up
+ * cost is paid outside of any timed test, and can be shared by
+ * all the load tests of a suite:
+ * <blockquote>
+ * <pre>
+ * pool = WorkerPool(100)
+ * suite.addTest(TimedTest(LoadTest(testA, 100, executor=pool), 2))
+ * suite.addTest(TimedTest(LoadTest(testB, 50, 10, executor=pool), 5))
+ * </pre>
+ * </blockquote>
+ * A pool should have at least as many threads as the users of
+ * the largest load test it runs; any users beyond that wait for
+ * a free thread, which lowers the effective concurrency.
+ * </p>
+"""
+
+import traceback
+from queue import Queue
+from threading import Thread
+
+from CustomExceptions import IllegalArgumentException
+
+
+class WorkerPool:
+
+    def __init__(self, size, name="WorkerPool"):
+        """
+         * Constructs a <code>WorkerPool</code> and starts its threads.
+         *
+         * @param size Number of worker threads.
+         * @param name Prefix of the names of the worker threads.
+        """
+        if size < 1:
+            raise IllegalArgumentException("Pool size must be > 0")
+        self.size = size
+        self.name = name
+        self.tasks = Queue()
+        self.threads = []
+        for i in range(size):
+            t = Thread(target=self.work, name=name + "-" + str(i))
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+
+    def submit(self, task, group=None):
+        """
+         * Submits a task to be run by the next free worker thread.
+         *
+         * @param task Callable to run.
+         * @param group <code>ThreadedGroup</code> that the task
+         *        belongs to until it completes, or <code>None</code>.
+        """
+        if not self.threads:
+            raise IllegalArgumentException("Worker pool is shut down")
+        if group is not None:
+            group.addThread(task)
+        self.tasks.put((task, group))
+
+    def work(self):
+        while True:
+            item = self.tasks.get()
+            if item is None:
+                return
+            task, group = item
+            try:
+                task()
+            except Exception:
+                traceback.print_exc()
+            finally:
+                if group is not None:
+                    group.delThread(task)
+
+    def shutdown(self, wait=True):
+        """
+         * Stops the worker threads once the submitted tasks
+         * have been run.
+         *
+         * @param wait <code>true</code> to wait for the threads to stop.
+        """
+        threads, self.threads = self.threads, []
+        for t in threads:
+            self.tasks.put(None)
+        if wait:
+            for t in threads:
+                t.join()
+
+    def __str__(self):
+        return self.name + " (" + str(self.size) + " threads)"
@@ -0,0 +1,311 @@
+"""
+ * Runs the performance tests of a suite in parallel worker
+ * processes and reports their merged result.
+ * <p>
+ * Modules are searched for suite providers: a module-level
+ * <code>suite()</code> function, or a class constructible without
+ * arguments that has a <code>suite()</code> method, such as
+ * <code>ExampleLoadTest</code>.  Each top-level test of each suite
+ * is run on its own, in a fresh worker process, so that tests do
+ * not share interpreter state.  From Python 3.11 on, a pool of
+ * worker processes that exit after one test is used; on earlier
+ * versions, each test gets a process pool of its own.  Tests are
+ * started as long as the CPUs they need fit in a CPU budget, which
+ * defaults to the number of CPUs, so that tests running side by
+ * side do not skew each other's timings.  A test needs one CPU, or
+ * the number of worker processes of a <code>LoadTest</code> run
+ * with <code>executor="process"</code>.
+ * </p>
+ * <p>
+ * The output of each test is printed once it completes, in the
+ * order the tests were discovered, followed by one report of all
+ * failures and errors.  To run the suites of the modules whose
+ * names contain "Test" in the current directory, use:
+ * <blockquote>
+ * <pre>
+ * python -m pyunitperf [--cpus N] [--pattern GLOB] [module or file ...]
+ * </pre>
+ * </blockquote>
+ * </p>
+"""
+
+import argparse
+import contextlib
+import fnmatch
+import importlib
+import inspect
+import io
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from unittest import TestResult, TestSuite
+
+from CustomExceptions import RemoteTestError
+from ProcessPoolTest import RemoteOutcome
+from Test import Test
+
+
+class PerfUnit(Test):
+    """
+     * Identifies a top-level test of a suite, which a worker
+     * process rebuilds from its provider.
+    """
+
+    def __init__(self, moduleName, providerName, index, name, cpuCost=1):
+        self.moduleName = moduleName
+        self.providerName = providerName
+        self.index = index
+        self.name = name
+        self.cpuCost = cpuCost
+
+    def countTestCases(self):
+        return 1
+
+    def __str__(self):
+        return self.name
+
+
+def getModuleName(argument):
+    if argument.endswith(".py"):
+        directory = os.path.dirname(os.path.abspath(argument))
+        if directory not in sys.path:
+            sys.path.insert(0, directory)
+        return os.path.splitext(os.path.basename(argument))[0]
+    return argument
+
+
+def findModules(pattern, directory="."):
+    """
+     * Returns the names of the modules in a directory whose
+     * file names match a pattern.
+    """
+    names = []
+    for fileName in sorted(os.listdir(directory)):
+        if fileName.endswith(".py") and fnmatch.fnmatch(fileName, pattern):
+            names.append(fileName[:-3])
+    return names
+
+
+def getProviders(module):
+    """
+     * Returns the names and suite factories of the suite
+     * providers defined in a module.
+    """
+    providers = []
+    function = getattr(module, "suite", None)
+    if inspect.isfunction(function):
+        providers.append(("suite", function))
+    for name, cls in inspect.getmembers(module, inspect.isclass):
+        if cls.__module__ != module.__name__ or not callable(getattr(cls, "suite", None)):
+            continue
+        try:
+            inspect.signature(cls).bind()
+        except TypeError:
+            continue
+        providers.append((name, lambda cls=cls: cls().suite()))
+    return providers
+
+
+def getProvider(module, providerName):
+    for name, provider in getProviders(module):
+        if name == providerName:
+            return provider
+    raise RemoteTestError("No suite provider " + providerName + " in " + module.__name__)
+
+
+def flatten(test):
+    """
+     * Returns the top-level tests of a suite, without the
+     * suites that group them.
+    """
+    if isinstance(test, TestSuite):
+        tests = []
+        for t in test:
+            tests.extend(flatten(t))
+        return tests
+    return [test]
+
+
+def getCpuCost(test):
+    """
+     * Returns the number of CPUs a test needs: the number of worker
+     * processes of a process-based load test it decorates, or 1.
+    """
+    while test is not None:
+        if getattr(test, "executor", None) == "process":
+            return getattr(test, "workers", 1)
+        test = getattr(test, "test", None)
+    return 1
+
+
+def closeProcessPools(test):
+    """
+     * Shuts down the worker processes that the process-based load
+     * tests decorated by a test keep across runs, which would
+     * otherwise keep the worker process running the test alive.
+    """
+    while test is not None:
+        if getattr(test, "executor", None) == "process" and hasattr(test, "close"):
+            test.close()
+        test = getattr(test, "test", None)
+
+
+def discover(moduleNames):
+    """
+     * Returns the <code>PerfUnit</code>s of the suites provided
+     * by the specified modules.
+    """
+    units = []
+    for moduleName in moduleNames:
+        module = importlib.import_module(moduleName)
+        for providerName, provider in getProviders(module):
+            for index, test in enumerate(flatten(provider())):
+                name = "%s.%s[%d] %s" % (moduleName, providerName, index, test)
+                units.append(PerfUnit(moduleName, providerName, index, name, getCpuCost(test)))
+    return units
+
+
+def runUnit(unit):
+    """
+     * Runs a <code>PerfUnit</code> in a worker process and returns
+     * its <code>RemoteOutcome</code>, elapsed time and output.
+    """
+    output = io.StringIO()
+    outcome = RemoteOutcome()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        module = importlib.import_module(unit.moduleName)
+        test = flatten(getProvider(module, unit.providerName)())[unit.index]
+        try:
+            test.run(outcome)
+        finally:
+            closeProcessPools(test)
+    return outcome, time.perf_counter() - start, output.getvalue()
+
+
+class PerfSuiteRunner:
+
+    def __init__(self, cpus=None, stream=sys.stdout):
+        """
+         * Constructs a <code>PerfSuiteRunner</code>.
+         *
+         * @param cpus CPU budget, by default the number of CPUs.
+         * @param stream Stream the report is written to.
+        """
+        self.cpus = max(1, cpus or os.cpu_count() or 1)
+        self.stream = stream
+
+    def run(self, units):
+        """
+         * Runs the units within the CPU budget and returns the
+         * merged <code>TestResult</code>.
+        """
+        result = TestResult()
+        outcomes = {}
+        pending = list(units)
+        running = {}
+        used = 0
+        start = time.perf_counter()
+        executor = self.createExecutor()
+        try:
+            while pending or running:
+                while pending:
+                    cost = min(pending[0].cpuCost, self.cpus)
+                    if running and used + cost > self.cpus:
+                        break
+                    unit = pending.pop(0)
+                    running[self.submit(executor, unit)] = (unit, cost)
+                    used += cost
+                done, notDone = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    unit, cost = running.pop(future)
+                    used -= cost
+                    outcomes[unit.name] = future
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        elapsedTime = time.perf_counter() - start
+        serialTime = 0.0
+        for unit in units:
+            serialTime += self.report(unit, outcomes[unit.name], result)
+        self.printSummary(result, elapsedTime, serialTime)
+        return result
+
+    def createExecutor(self):
+        """
+         * Returns a pool of worker processes that exit after one
+         * unit, or <code>None</code> before Python 3.11, which
+         * cannot limit the tasks of a worker process.
+        """
+        if sys.version_info >= (3, 11):
+            return ProcessPoolExecutor(max_workers=self.cpus, max_tasks_per_child=1)
+        return None
+
+    def submit(self, executor, unit):
+        """
+         * Submits a unit to the pool, or without a pool, to a
+         * worker process of its own.
+        """
+        if executor is not None:
+            return executor.submit(runUnit, unit)
+        executor = ProcessPoolExecutor(max_workers=1)
+        future = executor.submit(runUnit, unit)
+        executor.shutdown(wait=False)
+        return future
+
+    def report(self, unit, future, result):
+        """
+         * Adds the outcome of a unit to the merged result and
+         * prints its output.  Returns its elapsed time.
+        """
+        error = future.exception()
+        if error is not None:
+            result.testsRun += 1
+            result.addError(unit, (RemoteTestError, RemoteTestError(repr(error)), None))
+            self.stream.write(unit.name + " ... ERROR\n")
+            return 0.0
+        outcome, elapsedTime, output = future.result()
+        outcome.addTo(result, unit)
+        status = "ok"
+        if outcome.remoteErrors:
+            status = "ERROR"
+        elif outcome.remoteFailures:
+            status = "FAIL"
+        self.stream.write(output)
+        self.stream.write("%s ... %s (%.3f sec.)\n" % (unit.name, status, elapsedTime))
+        return elapsedTime
+
+    def printSummary(self, result, elapsedTime, serialTime):
+        separator = "=" * 70
+        for flavour, problems in (("ERROR", result.errors), ("FAIL", result.failures)):
+            for test, text in problems:
+                self.stream.write("\n%s\n%s: %s\n%s\n%s\n" % (separator, flavour, test, "-" * 70, text))
+        self.stream.write("\n" + "-" * 70 + "\n")
+        self.stream.write("Ran %d tests in %.3fs (%.3fs serially, CPU budget %d)\n\n" %
+                          (result.testsRun, elapsedTime, serialTime, self.cpus))
+        if result.wasSuccessful():
+            self.stream.write("OK\n")
+        else:
+            self.stream.write("FAILED (failures=%d, errors=%d)\n" %
+                              (len(result.failures), len(result.errors)))
+        self.stream.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pyunitperf",
+                                     description="Runs performance test suites in parallel processes.")
+    parser.add_argument("modules", nargs="*", help="modules or files providing suites")
+    parser.add_argument("--pattern", default="*Test*.py",
+                        help="file name pattern of the modules to search when none are given")
+    parser.add_argument("--cpus", type=int, default=None, help="CPU budget (default: number of CPUs)")
+    arguments = parser.parse_args(argv)
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    moduleNames = [getModuleName(m) for m in arguments.modules] or findModules(arguments.pattern)
+    result = PerfSuiteRunner(arguments.cpus).run(discover(moduleNames))
+    return 0 if result.wasSuccessful() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())